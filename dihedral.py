@@ -0,0 +1,106 @@
+import math
+import random
+from copy import deepcopy
+import numpy as np
+
+# The 8 symmetries of the unit square (the dihedral group D4), applied consistently to frames, poses, levels and
+# action labels, so one simulated step gives 8 training samples. A transform is (transpose, flip_x, flip_y), applied
+# in that order. Frames are indexed [x, y, ...] as getData returns them; pixel i covers x in [i/N, (i+1)/N), so
+# flipping the pixel axis is exactly x -> 1 - x.
+
+TRANSFORMS = [(t, fx, fy) for t in (False, True) for fx in (False, True) for fy in (False, True)]
+
+def is_reflection(transform):
+    return sum(transform) % 2 == 1
+
+def transform_frame(frame, transform, x_axis=0):
+    """View of frame under the transform; x_axis is the position of the x axis (1 for a batch of frames)."""
+    t, fx, fy = transform
+    y_axis = x_axis + 1
+    if t:
+        frame = frame.swapaxes(x_axis, y_axis)
+    index = [slice(None)]*frame.ndim
+    if fx:
+        index[x_axis] = slice(None, None, -1)
+    if fy:
+        index[y_axis] = slice(None, None, -1)
+    return frame[tuple(index)]
+
+def transform_point(x, y, transform):
+    t, fx, fy = transform
+    if t:
+        x, y = y, x
+    if fx:
+        x = 1 - x
+    if fy:
+        y = 1 - y
+    return x, y
+
+def transform_direction(direction, transform):
+    t, fx, fy = transform
+    if t:
+        direction = math.pi/2 - direction
+    if fx:
+        direction = math.pi - direction
+    if fy:
+        direction = 0 - direction
+    return direction % (2*math.pi)
+
+def transform_action(actionIndex, transform):
+    """Reflections reverse the sense of rotation, so the two swivels trade places; other actions are unchanged."""
+    if is_reflection(transform) and actionIndex in (3, 4):
+        return 7 - actionIndex
+    return actionIndex
+
+def transform_wall(params, transform):
+    wall_x, wall_y, wall_w, wall_h, wall_theta = params
+    c = math.cos(wall_theta)
+    s = math.sin(wall_theta)
+    x0, y0 = transform_point(wall_x, wall_y, transform)
+    if is_reflection(transform):
+        # a reflection turns the height edge into the width edge: anchor stays, w and h swap
+        x1, y1 = transform_point(wall_x - s, wall_y + c, transform)
+        wall_w, wall_h = wall_h, wall_w
+    else:
+        x1, y1 = transform_point(wall_x + c, wall_y + s, transform)
+    return [x0, y0, wall_w, wall_h, math.atan2(y1 - y0, x1 - x0) % (2*math.pi)]
+
+def transform_settings(settings, transform):
+    """The whole level under the transform, e.g. to check that a transformed frame matches a fresh render."""
+    res = deepcopy(settings)
+    res.agent_x, res.agent_y = transform_point(settings.agent_x, settings.agent_y, transform)
+    res.direction = transform_direction(settings.direction, transform)
+    res.gold = [list(transform_point(x, y, transform)) for x, y in settings.gold]
+    res.walls = [transform_wall(params, transform) for params in settings.walls]
+    return res
+
+
+def augment(frame, pose, actionIndex=None):
+    """All 8 transforms of one sample: frames (8, ...), poses (8, 3) as (agent_x, agent_y, direction), actions (8,)."""
+    frames = np.stack([transform_frame(frame, transform) for transform in TRANSFORMS])
+    poses = np.array([transform_point(pose[0], pose[1], transform) + (transform_direction(pose[2], transform),)
+                      for transform in TRANSFORMS])
+    if actionIndex is None:
+        return frames, poses
+    actions = np.array([transform_action(actionIndex, transform) for transform in TRANSFORMS], dtype=np.uint8)
+    return frames, poses, actions
+
+def dihedral_step(game, actionIndex):
+    """Steps the game once and returns the 8 transformed samples of (observation before the step, pose, action)."""
+    frame = game.getData().copy()
+    pose = (game.settings.agent_x, game.settings.agent_y, game.settings.direction)
+    game.act(actionIndex)
+    return augment(frame, pose, actionIndex)
+
+def random_dihedral_image_set(game, numFrames=20, restrict_angles=False, steps_per_level=10):
+    """Like discreteGame.random_full_image_set, but every simulated frame contributes its 8 transforms.
+    Returns frames (8*numFrames, ...) and matching poses. Careful: this replaces the game's level."""
+    frames = np.zeros((8*numFrames,) + game.observation_shape(), dtype=np.uint8)
+    poses = np.zeros((8*numFrames, 3))
+    for i in range(numFrames):
+        if i % steps_per_level == 0:
+            game.random_reset(restrict_angles)
+        else:
+            game.act(random.randint(1, 4))
+        frames[8*i:8*i + 8], poses[8*i:8*i + 8] = augment(game.getData(), (game.settings.agent_x, game.settings.agent_y, game.settings.direction))
+    return frames, poses
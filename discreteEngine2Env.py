@@ -5,6 +5,8 @@ import numpy as np
 from time import sleep
 from copy import deepcopy
 
+import eventLog # by module: GOLD below is the gold colour
+
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 
@@ -39,6 +41,9 @@ class DiscreteEngine2:
     self.agent_r = agent_r
     self.gold_r = gold_r
     self.mode = mode # 'human' or 'machine'
+    self.events = None # set by eventLog.EventBuffer.attach; machine mode is silent without it
+    self.event_source = 0
+    self.step_index = 0
     if initial_gold is not None: # Should be list of [x, y] positions
       self.initial_gold = initial_gold
     else:
@@ -62,7 +67,14 @@ class DiscreteEngine2:
 #    self.par = pygame.PixelArray(self.windowSurface)
     self.reset()
     
+  def end_episode(self):
+    # the finished episode, if any, for the event buffer; reset() calls this before starting the next
+    if self.events is not None and self.step_index:
+      self.events.append(eventLog.EPISODE_END, self.event_source, self.step_index, self.reward)
+    self.step_index = 0
+
   def reset(self):
+    self.end_episode()
     self.direction = self.initial_direction
     self.reward = self.initial_reward
     self.gold = deepcopy(self.initial_gold)
@@ -73,6 +85,7 @@ class DiscreteEngine2:
 
   def step(self, actionInd):
     prev_reward = self.reward
+    self.step_index += 1
     self.action_space[actionInd]() # If needed, incudes a draw and display update
     reward_delta = self.reward - prev_reward
     done = self.done()
@@ -171,7 +184,10 @@ class DiscreteEngine2:
       if (self.spot_overlap_check(self.agent_x, self.agent_y, self.gold[i][0], self.gold[i][1], self.gold_r)):
         del self.gold[i]
         self.reward += 1;
-        print("Reward: " + str(self.reward));
+        if self.events is not None:
+          self.events.append(eventLog.GOLD, self.event_source, self.step_index, self.reward)
+        if self.mode == 'human':
+          print("Reward: " + str(self.reward));
   
   def universal_update(self):
     self.gold_update()
@@ -218,16 +234,22 @@ class DiscreteEngine2:
         return i
     return 0
 
+  def _wall_contact(self, stepSize, lim):
+    if stepSize < lim and self.events is not None: # value in pixels, this engine's units
+      self.events.append(eventLog.WALL_CONTACT, self.event_source, self.step_index, stepSize)
+
   # Full definition of actions from here.
 
   def stepForward(self, lim=10):
     stepSize = self.biggest_step(lim, lambda step : (self.agent_x + step*math.cos(self.direction), self.agent_y + step*math.sin(self.direction)))
+    self._wall_contact(stepSize, lim)
     self.agent_x += stepSize*math.cos(self.direction)
     self.agent_y += stepSize*math.sin(self.direction)
     self.universal_update()
   
   def stepBackward(self, lim=10):
     stepSize = self.biggest_step(lim, lambda step : (self.agent_x - step*math.cos(self.direction), self.agent_y - step*math.sin(self.direction)))
+    self._wall_contact(stepSize, lim)
     self.agent_x -= stepSize*math.cos(self.direction)
     self.agent_y -= stepSize*math.sin(self.direction)
     self.universal_update()
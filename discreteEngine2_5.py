@@ -7,10 +7,50 @@ import numpy as np
 import random
 
 from levels.skeleton2_5 import *
+from frameStack import FrameRing
+import wallField
+import wallCompile
+import reachability
+from lruCache import LRUCache
+from eventLog import GOLD, WALL_CONTACT, EPISODE_END
+
+# Palette for obs_mode 'index' / 'onehot': class i is drawn as palette entry i.
+# The indicator line gets its own class, though it is black like the walls.
+PALETTE = [(255, 255, 255), # 0: background
+           (0, 0, 0),       # 1: wall
+           (0, 255, 0),     # 2: agent
+           (255, 200, 0),   # 3: gold
+           (0, 0, 0)]       # 4: indicator line
+NUM_CLASSES = len(PALETTE)
+_palette_array = np.array(PALETTE, dtype=np.uint8)
+
+# Swivels turn by exactly pi/30, so from a grid-aligned start there are only NUM_HEADINGS headings.
+NUM_HEADINGS = 60
+HEADING_STEP = math.pi/30
+HEADING_ANGLES = [k*HEADING_STEP for k in range(NUM_HEADINGS)]
+HEADING_COS = [math.cos(theta) for theta in HEADING_ANGLES]
+HEADING_SIN = [math.sin(theta) for theta in HEADING_ANGLES]
+
+def one_hot(indices):
+    return (indices[..., None] == np.arange(NUM_CLASSES, dtype=np.uint8)).astype(np.uint8)
+
+def decode_indices(frame):
+    """Class-index (or one-hot) observation back to RGB, for visualization."""
+    if frame.ndim >= 3 and frame.shape[-1] == NUM_CLASSES:
+        frame = frame.argmax(-1)
+    return _palette_array[frame]
+
+
+class _StaticSprite(pygame.sprite.DirtySprite):
+    """A fixed image at a fixed rect; only redrawn when something over or under it changes (or dirty is set)."""
+    def __init__(self, image, rect):
+        super().__init__()
+        self.image = image
+        self.rect = rect
 
 
 class discreteGame:
-    def __init__(self, settings = None, envMode = False):
+    def __init__(self, settings = None, envMode = False, incremental = False, level_id = '', physics = 'python', obs_mode = 'rgb', frame_stack = 0, egocentric = 0, ego_rotate = False, sdf_resolution = 0, transition_cache = 0, cache_quantum = 1e-9, frame_cache_bytes = 0, discrete_headings = False, compile_walls = True):
         # params for random initialization; usually ignored (put them into a Settings object?)
         self.typically_restrict_angles = False
         self.typical_indicator_length = 0.5
@@ -22,6 +62,43 @@ class discreteGame:
         self.typical_agent_r = 0.05
         self.typical_gold_r = 1.0/64
         self.typical_max_gold_num = 4
+        # None, 'tag' (record reachability.tag_level's counts in settings.metadata) or 'reject' (also resample until
+        # every gold is reachable). Checked on a typical_reachability_resolution grid.
+        self.typical_reachability = None
+        self.typical_reachability_resolution = 64
+        # where the random_* methods draw from: the random module by default, so random.seed() steers them. Give a
+        # game its own random.Random when it generates levels alongside other threads (see levelPool).
+        self.rng = random
+
+        # collision backend: 'python' (the methods below), 'numba' (physicsKernels, compiled if numba is importable),
+        # or 'auto' (numba only if it is installed). Same results either way.
+        # 'fixed' is its own deterministic mode (fixedPoint): poses snap to 1/fixedPoint.SCALE and to HEADING_ANGLES
+        # (so discrete_headings is on), and steps are worked out with integer collision tests.
+        self.physics = physics
+        self._kernels = None
+        self._walls_list = None
+        self._walls_arr = None
+        # compile_walls: collide against wallCompile's simplified walls (merged/contained walls removed, with bounding
+        # boxes for early rejection). Same results; fixed physics and the sdf use the walls as given.
+        self.compile_walls = compile_walls
+        self._compiled_list = None
+        self._compiled = None
+        if physics in ('numba', 'auto'):
+            import physicsKernels
+            if physics == 'numba' or physicsKernels.HAVE_NUMBA:
+                self._kernels = physicsKernels
+        self._fixed = None
+        if physics == 'fixed':
+            import fixedPoint
+            self._fixed = fixedPoint
+            discrete_headings = True
+
+        # sdf_resolution = N: answer full_wall_check from a per-level N x N signed distance field (wallField) instead,
+        # accurate to about 1/N. Also used while generating random levels, for both the gold and the agent radius.
+        self.sdf_resolution = sdf_resolution
+        self._field_walls = None
+        self._field = None
+
         if settings is None:
             settings = self.random_settings(restrict_angles = self.typically_restrict_angles)
 
@@ -29,6 +106,46 @@ class discreteGame:
         self.reward = 0
         self.envMode = envMode
         self.initial = deepcopy(settings)
+        self.level_id = level_id # free-form name, only used to label recorded episodes
+        self.seed = None # set by random_reset(seed=...)
+        self.trajectory_log = None # set by trajectoryLog.EpisodeRecorder.attach
+        self.level_pool = None # set by levelPool.LevelPool.attach
+        self.video_recorder = None # set by videoRecorder.VideoRecorder.attach
+        self.events = None # set by eventLog.EventBuffer.attach; envMode is silent without it
+        self.event_source = 0
+        self.step_index = 0 # actions taken this episode
+        self._contact = False # whether the current action was stopped short by a wall
+
+        # transition_cache = N: remember up to N (state, action) -> (next state, reward) results, keyed on the compact
+        # state with coordinates rounded to cache_quantum, and replay them without running collision. Dynamics are
+        # deterministic, so this only changes anything for states closer together than cache_quantum (0: exact keys).
+        self.cache_quantum = cache_quantum
+        self.transitions = LRUCache(maxsize=transition_cache) if transition_cache else None
+        self._level_serial = 0 # distinguishes levels in cache keys; bumped whenever self.initial is replaced
+        self._keyed_initial = self.initial # the level _level_serial currently stands for, see _sync_level
+
+        # frame_cache_bytes = B: keep rendered frames, up to B bytes, keyed like the transition cache (level, rounded
+        # pose, gold mask), and hand back the stored frame (read-only) instead of drawing. Most useful for no-ops,
+        # steps into walls and revisited poses.
+        # discrete_headings: while the direction is one of HEADING_ANGLES, keep it as an index into the tables above.
+        # Swivels become index arithmetic (no mod2pi), steps use the precomputed unit vectors, and the agent is blitted
+        # from a pre-rasterized sprite per heading. Any other direction (e.g. from random_settings) uses the float path.
+        self.discrete_headings = discrete_headings
+        self._heading = None
+        self._heading_dir = None # the direction value self._heading was derived from
+
+        self.frames = LRUCache(max_bytes=frame_cache_bytes, sizeof=lambda frame: frame.nbytes) if frame_cache_bytes else None
+        # In envMode, drawing is deferred until a frame is actually read (getData / write_frame), see redraw().
+        self._stale = False
+
+        # incremental rendering: only repair the rectangles that changed since the last draw,
+        # reading from a cached wall layer, and keep a persistent observation array in sync.
+        self.incremental = incremental
+        self._wall_layer = None
+        self._obs = None
+        self._drawn_agent_rect = None
+        self._dirty_rects = []
+        self._sprites = None # the human display's LayeredDirty group, see draw_human()
 
         self.BLACK = (0, 0, 0)
         self.WHITE = (255, 255, 255)
@@ -38,12 +155,35 @@ class discreteGame:
         self.BLUE = (0, 0, 255)
         
         self.GOLD = (255, 200, 0)
+        self.INDICATOR = self.BLACK
+
+        # 'index' renders straight into an 8-bit surface whose pixel values are the PALETTE classes, so
+        # getData() returns a (gameSize, gameSize) uint8 array; 'onehot' expands that to NUM_CLASSES channels.
+        assert obs_mode in ('rgb', 'index', 'onehot'), "obs_mode must be 'rgb', 'index' or 'onehot'"
+        assert envMode or obs_mode == 'rgb', "the human display needs obs_mode = 'rgb'"
+        self.obs_mode = obs_mode
+        if obs_mode != 'rgb':
+            self.WHITE, self.BLACK, self.GREEN, self.GOLD, self.INDICATOR = range(NUM_CLASSES) # mapped colors are palette indices
+
+        # frame_stack = k: step() and reset() return the k latest frames, oldest first, as a view into a FrameRing
+        # the renderer writes into directly. The view is overwritten by later steps.
+        self.frame_stack = frame_stack
+        self._ring = None
+
+        # egocentric = E: observations are an E x E window centred on the agent, at the usual gameSize pixels per unit,
+        # drawn directly from the geometry near the agent (nothing else is rendered). With ego_rotate the agent faces up.
+        assert not (egocentric and incremental), "egocentric views change completely every step; incremental does not apply"
+        assert envMode or not egocentric, "egocentric is an observation mode; the human display shows the whole level"
+        self.egocentric = egocentric
+        self.ego_rotate = ego_rotate
 
         self.actions = [(lambda : 0), self.stepForward, self.stepBackward, self.swivel_clock, self.swivel_anticlock]
         self.settings = settings
 
         if envMode:
-            self.windowSurface = pygame.Surface((self.settings.gameSize, self.settings.gameSize))
+            self.windowSurface = self.new_surface((self.settings.gameSize, self.settings.gameSize))
+            if egocentric:
+                self.windowSurface = self.new_surface((egocentric, egocentric)) # the full-level canvas is never needed
         else:
             # set up pygame
             pygame.init()
@@ -57,20 +197,67 @@ class discreteGame:
         if not self.envMode:
             self.humanGame()
 
+    def end_episode(self):
+        """Reports the finished episode, if any, to the event buffer; reset() calls this before starting the next."""
+        if self.events is not None and self.step_index:
+            self.events.append(EPISODE_END, self.event_source, self.step_index, self.reward)
+        self.step_index = 0
+
+    def _sync_level(self):
+        """Bumps _level_serial if self.initial has been replaced (random_reset, or assigned from outside) since the
+        caches last keyed on it."""
+        if self.initial is not self._keyed_initial:
+            self._keyed_initial = self.initial
+            self._level_serial += 1
+
     def reset(self):
+        self.end_episode()
+        self._sync_level()
         self.settings = deepcopy(self.initial)
         self.reward = 0
+        self.invalidate_render()
+        if self.trajectory_log is not None:
+            self.trajectory_log.begin_episode(self.settings, self.level_id, self.seed)
         self.universal_update()
         if not self.envMode:
             self.humanGame()
             return None, {}
         else:
-            return self.getData(), {} # dummy 'info' dictionary for now.
+            obs = self.observation(reset=True)
+            if self.video_recorder is not None:
+                self.video_recorder.begin_episode()
+                self.video_recorder.capture(self)
+            return obs, {} # dummy 'info' dictionary for now.
 
-    def random_reset(self, restrict_angles = False):
-        self.initial = self.random_settings(self.settings.gameSize, restrict_angles)
+    def random_reset(self, restrict_angles = False, seed = None):
+        if seed is not None:
+            self.rng.seed(seed) # level generation draws from self.rng
+        self.seed = seed
+        self.level_id = 'random'
+        if self.level_pool is not None and seed is None and self.level_pool.matches(self.settings.gameSize, restrict_angles):
+            self.initial = self.level_pool.get() # pre-generated; seeded resets stay synchronous so they are reproducible
+        else:
+            self.initial = self.random_settings(self.settings.gameSize, restrict_angles)
         return self.reset()
 
+    ####### Compact state: pose plus a bitmask over self.initial.gold. Enough to rebuild any step of an episode.
+    def compact_state(self):
+        gold_mask = 0
+        for i, coords in enumerate(self.initial.gold):
+            if coords in self.settings.gold:
+                gold_mask |= 1 << i
+        return self.settings.agent_x, self.settings.agent_y, self.settings.direction, gold_mask
+
+    def load_compact_state(self, state):
+        """Inverse of compact_state, relative to this game's own initial level. Redraws, but does not collect gold."""
+        agent_x, agent_y, direction, gold_mask = state
+        self.settings.agent_x = agent_x
+        self.settings.agent_y = agent_y
+        self.settings.direction = direction
+        self.settings.gold = [deepcopy(coords) for i, coords in enumerate(self.initial.gold) if (gold_mask >> i) & 1]
+        self._obs = None # gold may have come back, so the next draw is a full one
+        self.redraw()
+
     ####### Functions for drawing / evaluating position.
     def backRot(self, pos_x, pos_y, theta): # Counterclockwise, compensating
         c = math.cos(theta)
@@ -99,19 +286,67 @@ class discreteGame:
     def true_coords(self, coords):
         return coords[0]*self.settings.gameSize, coords[1]*self.settings.gameSize
 
-    def draw_agent(self):
+    # Shared by all games. The sprite is only the body: the indicator line is long (half the level, typically), so
+    # it is cheaper to draw it from its precomputed endpoint offset than to blit a mostly empty square.
+    _agent_sprites = {} # (gameSize, agent_r, obs_mode) -> (surface, offset)
+    _indicator_offsets = {} # (gameSize, indicator_length) -> [(dx, dy) per heading]
+
+    def _agent_sprite(self):
+        key = (self.settings.gameSize, self.settings.agent_r, self.obs_mode)
+        sprite = discreteGame._agent_sprites.get(key)
+        if sprite is None:
+            agent_r = self.settings.agent_r * self.settings.gameSize
+            offset = math.ceil(agent_r) + 1
+            surface = self.new_surface((2*offset + 1, 2*offset + 1))
+            surface.fill(self.WHITE)
+            surface.set_colorkey(self.WHITE)
+            pygame.draw.circle(surface, self.GREEN, (offset, offset), agent_r)
+            sprite = (surface, offset)
+            discreteGame._agent_sprites[key] = sprite
+        return sprite
+
+    def _indicator_offset(self, heading):
+        key = (self.settings.gameSize, self.settings.indicator_length)
+        offsets = discreteGame._indicator_offsets.get(key)
+        if offsets is None:
+            indicator_length = self.settings.indicator_length * self.settings.gameSize
+            offsets = [(c*indicator_length, s*indicator_length) for c, s in zip(HEADING_COS, HEADING_SIN)]
+            discreteGame._indicator_offsets[key] = offsets
+        return offsets[heading]
+
+    def other_agents(self):
+        """Positions of any other agents sharing this level (see multiAgent.py); drawn as bodies, without indicators."""
+        return []
+
+    def draw_agent(self, surface=None, origin=(0, 0)):
+        """origin: pixel position of the surface's top-left corner in the level (for drawing into a sprite image)."""
+        if surface is None:
+            surface = self.windowSurface
+        ox, oy = origin
+        agent_r = self.settings.agent_r * self.settings.gameSize
+        for coords in self.other_agents():
+            x, y = self.true_coords(coords)
+            pygame.draw.circle(surface, self.GREEN, (x - ox, y - oy), agent_r)
+        heading = self._heading_index()
+        if heading is not None:
+            sprite, offset = self._agent_sprite()
+            agent_x, agent_y = self.true_coords((self.settings.agent_x, self.settings.agent_y))
+            surface.blit(sprite, (int(agent_x) - offset - ox, int(agent_y) - offset - oy))
+            dx, dy = self._indicator_offset(heading)
+            pygame.draw.line(surface, self.INDICATOR, (agent_x - ox, agent_y - oy), (agent_x - ox + dx, agent_y - oy + dy))
+            return
         # I *could* move this to the init function, but I won't for now.
         # If CPU computation becomes a problem, that's an easy optimization
-        agent_x = self.settings.agent_x * self.settings.gameSize
-        agent_y = self.settings.agent_y * self.settings.gameSize
+        agent_x = self.settings.agent_x * self.settings.gameSize - ox
+        agent_y = self.settings.agent_y * self.settings.gameSize - oy
         agent_r = self.settings.agent_r * self.settings.gameSize
         indicator_length = self.settings.indicator_length * self.settings.gameSize
-        pygame.draw.circle(self.windowSurface, \
+        pygame.draw.circle(surface, \
                            self.GREEN, \
                            (agent_x, agent_y), \
                            agent_r)
-        pygame.draw.line(self.windowSurface, \
-                         self.BLACK, 
+        pygame.draw.line(surface, \
+                         self.INDICATOR, 
                          (agent_x, agent_y), (agent_x + math.cos(self.settings.direction)*indicator_length, agent_y + math.sin(self.settings.direction)*indicator_length))
     
     def draw_gold(self):
@@ -120,32 +355,221 @@ class discreteGame:
             tc = self.true_coords(coords)
             pygame.draw.circle(self.windowSurface, self.GOLD, tc, gold_r)
 
+    def _agent_rect(self):
+        """Pixel bounding box of the agent circle plus its indicator line, padded by a pixel each side."""
+        agent_x, agent_y = self.true_coords((self.settings.agent_x, self.settings.agent_y))
+        agent_r = self.settings.agent_r * self.settings.gameSize
+        indicator_length = self.settings.indicator_length * self.settings.gameSize
+        end_x = agent_x + math.cos(self.settings.direction)*indicator_length
+        end_y = agent_y + math.sin(self.settings.direction)*indicator_length
+        left = math.floor(min(agent_x - agent_r, end_x)) - 2
+        top = math.floor(min(agent_y - agent_r, end_y)) - 2
+        right = math.ceil(max(agent_x + agent_r, end_x)) + 2
+        bot = math.ceil(max(agent_y + agent_r, end_y)) + 2
+        return pygame.Rect(left, top, right - left, bot - top)
+
+    def _gold_rect(self, coords):
+        gold_x, gold_y = self.true_coords(coords)
+        gold_r = self.settings.gold_r * self.settings.gameSize
+        left = math.floor(gold_x - gold_r) - 2
+        top = math.floor(gold_y - gold_r) - 2
+        size = math.ceil(2*gold_r) + 5
+        return pygame.Rect(left, top, size, size)
+
     def true_wall_params(self, params):
         tp = [val * self.settings.gameSize for val in params[:4]]
         tp.append(params[4]) # angle treated differently
         return tp
     
-    def draw_walls(self):
+    def draw_walls(self, surface=None):
+        if surface is None:
+            surface = self.windowSurface
         for params in self.settings.walls:
             tp = self.true_wall_params(params)
-            clientSurface = pygame.Surface((tp[2], tp[3]))
+            clientSurface = self.new_surface((tp[2], tp[3]))
             clientSurface.fill(self.WHITE)
             clientSurface.set_colorkey(self.WHITE)
 #            clientSurface = clientSurface.convert_alpha(self.windowSurface)
             pygame.draw.rect(clientSurface, self.BLACK, (0, 0, tp[2], tp[3]))
             clientSurface = pygame.transform.rotate(clientSurface, 0 - params[4]*180/math.pi) # Format is consistent with js
             newX, newY = self.top_corner_adjustment(tp[0], tp[1], tp[2], tp[3], tp[4])
-            self.windowSurface.blit(clientSurface, (newX, newY))
-    
-    
+            surface.blit(clientSurface, (newX, newY))
+
+    def new_surface(self, size):
+        if self.obs_mode == 'rgb':
+            return pygame.Surface(size)
+        surface = pygame.Surface(size, 0, 8)
+        surface.set_palette(PALETTE)
+        return surface
+
+    def wall_layer(self):
+        """Walls pre-rendered once per level onto a WHITE-keyed surface, so they can be blitted over the agent cheaply."""
+        if self._wall_layer is None:
+            layer = self.new_surface((self.settings.gameSize, self.settings.gameSize))
+            layer.fill(self.WHITE)
+            layer.set_colorkey(self.WHITE)
+            self.draw_walls(layer)
+            self._wall_layer = layer
+        return self._wall_layer
+
+    def invalidate_render(self):
+        """Call after replacing self.settings wholesale; the next draw is then a full repaint."""
+        self._wall_layer = None
+        self._obs = None
+        self._drawn_agent_rect = None
+        self._dirty_rects = []
+        self._sprites = None
+
+    def _wall_polygon(self, params):
+        """Wall corners in world units, clockwise from the anchor; same geometry as wall_overlap_check."""
+        wall_x, wall_y, wall_w, wall_h, wall_theta = params
+        c = math.cos(wall_theta)
+        s = math.sin(wall_theta)
+        return [(wall_x, wall_y),
+                (wall_x + wall_w*c, wall_y + wall_w*s),
+                (wall_x + wall_w*c - wall_h*s, wall_y + wall_w*s + wall_h*c),
+                (wall_x - wall_h*s, wall_y + wall_h*c)]
+
+    def draw_egocentric(self):
+        """Agent-centred window. Geometry farther than the window's half-diagonal is skipped before any transform.
+        Space outside the level is left as background."""
+        scale = self.settings.gameSize
+        half = self.egocentric / 2
+        reach = half*math.sqrt(2) / scale
+        agent_x = self.settings.agent_x
+        agent_y = self.settings.agent_y
+        if self.ego_rotate:
+            phi = 0 - math.pi/2 - self.settings.direction # turns the heading to (0, -1)
+        else:
+            phi = 0
+        c = math.cos(phi)
+        s = math.sin(phi)
+        def to_window(x, y):
+            dx = (x - agent_x)*scale
+            dy = (y - agent_y)*scale
+            return half + c*dx - s*dy, half + s*dx + c*dy
+
+        self.windowSurface.fill(self.WHITE)
+        indicator_length = self.settings.indicator_length
+        pygame.draw.circle(self.windowSurface, self.GREEN, (half, half), self.settings.agent_r*scale)
+        pygame.draw.line(self.windowSurface, self.INDICATOR, (half, half),
+                         to_window(agent_x + math.cos(self.settings.direction)*indicator_length, agent_y + math.sin(self.settings.direction)*indicator_length))
+        for x, y in self.other_agents():
+            pygame.draw.circle(self.windowSurface, self.GREEN, to_window(x, y), self.settings.agent_r*scale)
+        for params in self.settings.walls:
+            polygon = self._wall_polygon(params)
+            xs = [p[0] for p in polygon]
+            ys = [p[1] for p in polygon]
+            gap_x = max(min(xs) - agent_x, agent_x - max(xs), 0)
+            gap_y = max(min(ys) - agent_y, agent_y - max(ys), 0)
+            if gap_x*gap_x + gap_y*gap_y > reach*reach:
+                continue
+            pygame.draw.polygon(self.windowSurface, self.BLACK, [to_window(x, y) for x, y in polygon])
+        gold_r = self.settings.gold_r
+        for coords in self.settings.gold:
+            if math.sqrt((coords[0] - agent_x)**2 + (coords[1] - agent_y)**2) - gold_r > reach:
+                continue
+            pygame.draw.circle(self.windowSurface, self.GOLD, to_window(coords[0], coords[1]), gold_r*scale)
+
+    def redraw(self):
+        """Draws right away for the human display; in envMode only marks the frame stale, so that several actions
+        between observations (random_jitter, step_many-style loops, cache hits) cost one draw, or none."""
+        if self.envMode:
+            self._stale = True
+        else:
+            self.draw()
+
+    def _ensure_drawn(self):
+        if self._stale:
+            self.draw()
+
     def draw(self):
-      self.windowSurface.fill(self.WHITE)
-      self.draw_agent()
-      self.draw_walls()
-      self.draw_gold()
+      self._stale = False
       if not self.envMode:
-          pygame.display.update()
+          self.draw_human()
+      elif self.egocentric:
+          self.draw_egocentric()
+      elif self.incremental and self._obs is not None:
+          self.draw_dirty()
+      else:
+          self.windowSurface.fill(self.WHITE)
+          self.draw_agent()
+          self.windowSurface.blit(self.wall_layer(), (0, 0)) # same pixels as draw_walls(), without re-rotating every wall
+          self.draw_gold()
+          if self.incremental:
+              self._obs = self._array()
+              self._drawn_agent_rect = self._agent_rect()
+              self._dirty_rects = []
+
+    def draw_dirty(self):
+        """Repaint only the old and new agent boxes and any removed gold, then copy those rectangles into self._obs"""
+        new_rect = self._agent_rect()
+        rects = self._dirty_rects + [self._drawn_agent_rect, new_rect]
+        bounds = self.windowSurface.get_rect()
+        layer = self.wall_layer()
+        repaired = []
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            self.windowSurface.set_clip(rect)
+            self.windowSurface.fill(self.WHITE, rect)
+            self.draw_agent()
+            self.windowSurface.blit(layer, rect.topleft, rect)
+            self.draw_gold()
+            repaired.append(rect)
+        self.windowSurface.set_clip(None)
+        pixels = self._pixels()
+        for rect in repaired:
+            self._obs[rect.left:rect.right, rect.top:rect.bottom] = pixels[rect.left:rect.right, rect.top:rect.bottom]
+        del pixels # releases the surface lock
+        self._drawn_agent_rect = new_rect
+        self._dirty_rects = []
     
+    def _human_sprites(self):
+        """Background, agent, walls, gold as a LayeredDirty group, in the same stacking order as draw()."""
+        if self._sprites is None:
+            background = self.new_surface(self.windowSurface.get_size())
+            background.fill(self.WHITE)
+            group = pygame.sprite.LayeredDirty()
+            group.add(_StaticSprite(self.wall_layer(), self.wall_layer().get_rect()), layer=1)
+            for coords in self.settings.gold:
+                rect = self._gold_rect(coords)
+                gold = self.new_surface(rect.size)
+                gold.fill(self.WHITE)
+                gold.set_colorkey(self.WHITE)
+                tc = self.true_coords(coords)
+                pygame.draw.circle(gold, self.GOLD, (tc[0] - rect.left, tc[1] - rect.top), self.settings.gold_r * self.settings.gameSize)
+                sprite = _StaticSprite(gold, rect)
+                sprite.coords = coords
+                group.add(sprite, layer=2)
+            self._human_agent = _StaticSprite(None, None)
+            self._human_agent.pose = None
+            group.clear(self.windowSurface, background)
+            group.repaint_rect(self.windowSurface.get_rect()) # first frame after a new level is a full one
+            self._sprites = group
+        return self._sprites
+
+    def draw_human(self):
+        """Human display: only the agent and any collected gold are redrawn, and only their rects go to the display."""
+        group = self._human_sprites()
+        agent = self._human_agent
+        pose = (self.settings.agent_x, self.settings.agent_y, self.settings.direction)
+        if pose != agent.pose:
+            agent.pose = pose
+            agent.rect = self._agent_rect().clip(self.windowSurface.get_rect()) # lines clip where the window's do
+            agent.image = self.new_surface(agent.rect.size)
+            agent.image.fill(self.WHITE)
+            agent.image.set_colorkey(self.WHITE)
+            self.draw_agent(agent.image, agent.rect.topleft)
+            agent.dirty = 1
+            if not agent.alive():
+                group.add(agent, layer=0)
+        for sprite in group.get_sprites_from_layer(2):
+            if sprite.coords not in self.settings.gold:
+                sprite.kill() # LayeredDirty repaints what was under it
+        pygame.display.update(group.draw(self.windowSurface))
+
     ####### Overlap detection / updating function
     def mod2pi(self, theta):
         rotationAngle = math.floor(theta/(2*math.pi))*2*math.pi
@@ -170,15 +594,20 @@ class discreteGame:
                                    self.settings.gold[i][0], \
                                    self.settings.gold[i][1], \
                                    self.settings.gold_r)):
+                if self.incremental:
+                    self._dirty_rects.append(self._gold_rect(self.settings.gold[i]))
                 del self.settings.gold[i]
                 self.reward += 1;
                 collected += 1
-                print("Reward: " + str(self.reward));
+                if self.events is not None:
+                    self.events.append(GOLD, self.event_source, self.step_index, self.reward)
+                if not self.envMode:
+                    print("Reward: " + str(self.reward));
         return collected
     
     def universal_update(self):
         collected = self.gold_update()
-        self.draw()
+        self.redraw()
         if not self.envMode:
             sleep(1.0/10)
         return collected
@@ -214,7 +643,26 @@ class discreteGame:
     def full_wall_check(self, test_x, test_y, walls=None, agent_r=None):
         if walls is None: # This is also used for random level generation, placing both gold and the agent, hence the ambiguity
             walls = self.settings.walls
-        for params in walls:
+        if self.sdf_resolution:
+            if agent_r is None:
+                agent_r = self.settings.agent_r
+            if walls is not self._field_walls:
+                self._field_walls = walls
+                self._field = wallField.field_for(walls, self.sdf_resolution)
+            return self._field.clear(test_x, test_y, agent_r)
+        if self._kernels is not None:
+            if agent_r is None:
+                agent_r = self.settings.agent_r
+            return self._kernels.full_wall_check(test_x, test_y, self._walls_array(walls), agent_r)
+        if not self.compile_walls:
+            for params in walls:
+                if self.wall_overlap_check(test_x, test_y, params[0], params[1], params[2], params[3], params[4], agent_r):
+                    return False
+            return True
+        reach = (self.settings.agent_r if agent_r is None else agent_r) + wallCompile.BOUNDS_SLACK
+        for params, (min_x, min_y, max_x, max_y) in self._compiled_walls(walls):
+            if test_x <= min_x - reach or test_x >= max_x + reach or test_y <= min_y - reach or test_y >= max_y + reach:
+                continue
             if self.wall_overlap_check(test_x, test_y, params[0], params[1], params[2], params[3], params[4], agent_r):
                 return False
         return True
@@ -230,31 +678,106 @@ class discreteGame:
                 return step
             step -= min_step
         return 0
+
+    def _walls_array(self, walls):
+        if walls is not self._walls_list: # walls lists are never mutated in place, so identity is enough
+            self._walls_list = walls
+            self._walls_arr = self._kernels.walls_array(wallCompile.simplify_walls(walls) if self.compile_walls else walls)
+        return self._walls_arr
+
+    def _compiled_walls(self, walls):
+        if walls is not self._compiled_list:
+            self._compiled_list = walls
+            self._compiled = wallCompile.compile_walls(walls)
+        return self._compiled
+
+    def _step_size(self, dir_x, dir_y, lim):
+        if self._kernels is not None:
+            return self._kernels.biggest_step(self.settings.agent_x, self.settings.agent_y, dir_x, dir_y, lim, 1.0/self.settings.gameSize,
+                                              self._walls_array(self.settings.walls), self.settings.agent_r)
+        return self.biggest_step(lim, lambda step : (self.settings.agent_x + step*dir_x, self.settings.agent_y + step*dir_y))
     
     ## Full definition of actions from here.    
+    def _heading_index(self):
+        """Index into HEADING_ANGLES if discrete_headings is on and the direction is on that grid, else None."""
+        if not self.discrete_headings:
+            return None
+        direction = self.settings.direction
+        if direction != self._heading_dir: # direction was set from outside (reset, load_compact_state, ...)
+            k = round(direction / HEADING_STEP)
+            if abs(direction - k*HEADING_STEP) < 1e-9 or self._fixed is not None: # fixed physics snaps any direction
+                self._heading = k % NUM_HEADINGS
+                self.settings.direction = HEADING_ANGLES[self._heading]
+            else:
+                self._heading = None
+            self._heading_dir = self.settings.direction
+        return self._heading
+
+    def _unit_vector(self):
+        heading = self._heading_index()
+        if heading is not None:
+            return HEADING_COS[heading], HEADING_SIN[heading]
+        return math.cos(self.settings.direction), math.sin(self.settings.direction)
+
+    def _fixed_step(self, sign, lim):
+        fp = self._fixed
+        if self.settings.walls is not self._walls_list:
+            self._walls_list = self.settings.walls
+            self._walls_arr = fp.wall_table(self.settings.walls)
+        r = fp.to_units(self.settings.agent_r) << fp.DIR_BITS
+        min_step = fp.to_units(1.0/self.settings.gameSize)
+        step, x, y = fp.biggest_step(fp.to_units(self.settings.agent_x), fp.to_units(self.settings.agent_y),
+                                     self._heading_index(), sign, fp.to_units(lim), min_step, self._walls_arr, r)
+        self._wall_contact(fp.to_world(step), fp.to_world(fp.to_units(lim)))
+        self.settings.agent_x = fp.to_world(x)
+        self.settings.agent_y = fp.to_world(y)
+        return self.universal_update()
+
     def stepForward(self, lim=None):
         if lim is None:
             lim = 1.0/64 # big enough for most pixelations, small enough to make gameSize 800 interesting.
-        stepSize = self.biggest_step(lim, lambda step : (self.settings.agent_x + step*math.cos(self.settings.direction), self.settings.agent_y + step*math.sin(self.settings.direction)))
-        self.settings.agent_x += stepSize*math.cos(self.settings.direction)
-        self.settings.agent_y += stepSize*math.sin(self.settings.direction)
+        if self._fixed is not None:
+            return self._fixed_step(1, lim)
+        c, s = self._unit_vector()
+        stepSize = self._step_size(c, s, lim)
+        self._wall_contact(stepSize, lim)
+        self.settings.agent_x += stepSize*c
+        self.settings.agent_y += stepSize*s
         return self.universal_update() # returns the gold collected this step.
     
     def stepBackward(self, lim=None):
         if lim is None:
             lim = 1.0/64 # big enough for most pixelations, small enough to make gameSize 800 interesting.
-        stepSize = self.biggest_step(lim, lambda step : (self.settings.agent_x - step*math.cos(self.settings.direction), self.settings.agent_y - step*math.sin(self.settings.direction)))
-        self.settings.agent_x -= stepSize*math.cos(self.settings.direction)
-        self.settings.agent_y -= stepSize*math.sin(self.settings.direction)
+        if self._fixed is not None:
+            return self._fixed_step(-1, lim)
+        c, s = self._unit_vector()
+        stepSize = self._step_size(0 - c, 0 - s, lim)
+        self._wall_contact(stepSize, lim)
+        self.settings.agent_x -= stepSize*c
+        self.settings.agent_y -= stepSize*s
+        return self.universal_update()
+
+    def _wall_contact(self, stepSize, lim):
+        if stepSize < lim:
+            self._contact = True
+            if self.events is not None:
+                self.events.append(WALL_CONTACT, self.event_source, self.step_index, stepSize)
+
+    def _swivel(self, delta):
+        heading = self._heading_index()
+        if heading is not None:
+            self._heading = (heading + delta) % NUM_HEADINGS
+            self.settings.direction = HEADING_ANGLES[self._heading]
+            self._heading_dir = self.settings.direction
+        else:
+            self.settings.direction = self.mod2pi(self.settings.direction + delta*math.pi/30)
         return self.universal_update()
     
     def swivel_anticlock(self):
-        self.settings.direction = self.mod2pi(self.settings.direction + math.pi/30)
-        return self.universal_update()
+        return self._swivel(1)
     
     def swivel_clock(self):
-        self.settings.direction = self.mod2pi(self.settings.direction - math.pi/30)
-        return self.universal_update()
+        return self._swivel(-1)
 
     ####### Function for "Arcade" UI   
     def humanGame(self):    
@@ -280,21 +803,178 @@ class discreteGame:
                     return None
 
     ####### Functions for machine UI: numpy arrays and zoomed-in numpy arrays as output.
-    def step(self, actionIndex):
+    def act(self, actionIndex):
+        """step() without building an observation; returns the reward."""
+        if self.trajectory_log is not None:
+            self.trajectory_log.record(actionIndex)
+        self.step_index += 1
+        if self.transitions is None:
+            return self.actions[actionIndex]()
+        key = self._transition_key(actionIndex)
+        cached = self.transitions.get(key)
+        if cached is not None:
+            next_state, reward, contact = cached
+            self._apply_transition(next_state, reward, contact)
+            return reward
+        self._contact = False
         reward = self.actions[actionIndex]()
-        obs = self.getData()
+        self.transitions.put(key, (self.compact_state(), reward, self._contact))
+        return reward
+
+    def _state_key(self):
+        self._sync_level() # also when initial was swapped without a reset, e.g. before load_compact_state
+        agent_x, agent_y, direction, gold_mask = self.compact_state()
+        q = self.cache_quantum
+        if q: # else exact float keys
+            agent_x, agent_y, direction = round(agent_x / q), round(agent_y / q), round(direction / q)
+        return (self._level_serial, agent_x, agent_y, direction, gold_mask)
+
+    def _transition_key(self, actionIndex):
+        return self._state_key() + (actionIndex,)
+
+    def _apply_transition(self, next_state, reward, contact=False):
+        agent_x, agent_y, direction, gold_mask = next_state
+        removed = self.compact_state()[3] & ~gold_mask
+        if self.events is not None: # same events as running the action would have sent
+            if contact:
+                step = math.sqrt((agent_x - self.settings.agent_x)**2 + (agent_y - self.settings.agent_y)**2)
+                self.events.append(WALL_CONTACT, self.event_source, self.step_index, step)
+            running = self.reward
+            for i in range(len(self.initial.gold) - 1, -1, -1):
+                if (removed >> i) & 1:
+                    running += 1
+                    self.events.append(GOLD, self.event_source, self.step_index, running)
+        for i, coords in enumerate(self.initial.gold):
+            if self.incremental and (removed >> i) & 1:
+                self._dirty_rects.append(self._gold_rect(coords))
+        self.settings.agent_x = agent_x
+        self.settings.agent_y = agent_y
+        self.settings.direction = direction
+        self.settings.gold = [deepcopy(coords) for i, coords in enumerate(self.initial.gold) if (gold_mask >> i) & 1]
+        self.reward += reward
+        self.redraw()
+
+    def step(self, actionIndex):
+        reward = self.act(actionIndex)
+        obs = self.observation()
+        if self.video_recorder is not None:
+            self.video_recorder.capture(self, reward)
         terminated = False # dummies for now
         truncated = False
         info = {}
         return obs, reward, terminated, truncated, info
 
+    def step_many(self, actions, observe='final'):
+        """Runs a whole action sequence in one call; rewards come back as a float32 array, one per action.
+        observe: 'final' (the observation after the last action, as step() would return it), None (nothing is
+        rendered at all), 'all', or a sequence of step indices (a (len, ...) array of the frames right after those
+        actions). Unobserved steps are never drawn, except the last frame_stack ones (the stack needs them) and any
+        step an attached video recorder captures."""
+        actions = np.asarray(actions, dtype=np.int64)
+        n = len(actions)
+        rewards = np.zeros(n, dtype=np.float32)
+        final = isinstance(observe, str) and observe == 'final' # observe may be an int array; don't compare it
+        if observe is None or final:
+            wanted = ()
+        elif isinstance(observe, str):
+            assert observe == 'all', "observe must be 'final', None, 'all' or step indices"
+            wanted = range(n)
+        else:
+            wanted = observe
+        frames = np.zeros((len(wanted),) + self.observation_shape(), dtype=np.uint8) if len(wanted) else None
+        slots = {}
+        for k, t in enumerate(wanted): # checked before any action runs
+            t = int(t)
+            if not -n <= t < n:
+                raise IndexError("step index " + str(t) + " out of range for " + str(n) + " actions")
+            slots.setdefault(t + n if t < 0 else t, []).append(k)
+        stacked_from = n - self.frame_stack if self.frame_stack else n
+        for t in range(n):
+            rewards[t] = self.act(actions[t])
+            if t >= stacked_from:
+                self.observation()
+            if self.video_recorder is not None:
+                self.video_recorder.capture(self, rewards[t])
+            for k in slots.get(t, ()):
+                self.write_frame(frames[k])
+        if final:
+            if self.frame_stack:
+                obs = self._ring.view() if self._ring is not None else self.observation()
+            else:
+                obs = self.getData()
+        else:
+            obs = frames
+        return obs, rewards, False, False, {}
+
+    def _array(self):
+        if self.obs_mode == 'rgb':
+            return pygame.surfarray.array3d(self.windowSurface)
+        return pygame.surfarray.array2d(self.windowSurface)
+
+    def _pixels(self): # view into the surface; holds a lock on it until deleted
+        if self.obs_mode == 'rgb':
+            return pygame.surfarray.pixels3d(self.windowSurface)
+        return pygame.surfarray.pixels2d(self.windowSurface)
+
+    def observation_shape(self):
+        size = self.egocentric or self.settings.gameSize
+        return {'rgb' : (size, size, 3), 'index' : (size, size), 'onehot' : (size, size, NUM_CLASSES)}[self.obs_mode]
+
+    def observation(self, reset=False):
+        """What step() / reset() return: getData(), or the frame stack if frame_stack is set."""
+        if not self.frame_stack:
+            return self.getData()
+        if self._ring is None:
+            self._ring = FrameRing(self.frame_stack, self.observation_shape())
+            reset = True # no history yet
+        self.write_frame(self._ring.next_slot())
+        if reset:
+            self._ring.fill_history()
+        return self._ring.view()
+
+    def _cached_frame(self):
+        key = self._state_key() + (self.settings.gameSize,)
+        frame = self.frames.get(key)
+        if frame is None:
+            self._ensure_drawn()
+            frame = self._obs.copy() if self.incremental else self._array()
+            frame.setflags(write=False) # shared with every later hit
+            self.frames.put(key, frame)
+        return frame
+
     def getData(self):
-        return pygame.surfarray.array3d(self.windowSurface)
+        if self.frames is not None:
+            frame = self._cached_frame()
+        elif self.incremental:
+            self._ensure_drawn()
+            frame = self._obs # persistent buffer, updated in place by later steps; copy it to keep a frame.
+        else:
+            self._ensure_drawn()
+            frame = self._array()
+        if self.obs_mode == 'onehot':
+            return one_hot(frame)
+        return frame
+
+    def write_frame(self, out):
+        """Same as getData, but copies into a preallocated array (e.g. one slot of a batch) instead of allocating."""
+        if self.frames is not None:
+            frame = self._cached_frame()
+        elif self.incremental:
+            self._ensure_drawn()
+            frame = self._obs
+        else:
+            self._ensure_drawn()
+            frame = self._pixels()
+        if self.obs_mode == 'onehot':
+            out[...] = frame[..., None] == np.arange(NUM_CLASSES, dtype=np.uint8)
+        else:
+            out[...] = frame
+        del frame # releases the surface lock, if frame was a view
 
     def blowup(self, factor):
         bigSettings = deepcopy(self.settings)
         bigSettings.gameSize = int(factor*self.settings.gameSize)
-        slave = discreteGame(bigSettings, envMode=True)
+        slave = discreteGame(bigSettings, envMode=True, obs_mode=self.obs_mode)
         return slave.getData()
 
     def _zoom_helper(self, center, factor, canvas):
@@ -309,7 +989,7 @@ class discreteGame:
     def zoom(self, centers, factor):
         assert factor >= 1, "factor must be larger than 1.9"
         canvas = self.blowup(factor) # this part may be slow; a better function would only draw what's in frame.
-        batch = np.zeros((len(centers), self.settings.gameSize, self.settings.gameSize, 3))
+        batch = np.zeros((len(centers),) + self.observation_shape())
         for i in range(len(centers)):
             batch[i] = self._zoom_helper(centers[i], factor, canvas)
         return batch
@@ -318,15 +998,15 @@ class discreteGame:
         num_actions = 3
         max_num_repeats = 30
         for _ in range(num_actions):
-            action_ind = random.randint(1, 4) # skip the 'do nothing' action.
-            for _ in range(random.randint(1, max_num_repeats)):
+            action_ind = self.rng.randint(1, 4) # skip the 'do nothing' action.
+            for _ in range(self.rng.randint(1, max_num_repeats)):
                 self.actions[action_ind]()
             
            
     def random_center_near(self, point, scale=None):
         if scale is None:
             scale = self.settings.gold_r
-        return (random.uniform(point[0] - scale, point[0] + scale), random.uniform(point[1] - scale, point[1] + scale))
+        return (self.rng.uniform(point[0] - scale, point[0] + scale), self.rng.uniform(point[1] - scale, point[1] + scale))
 
     def corners(self, wall_x, wall_y, wall_w, wall_h, wall_theta):
         c = math.cos( 0 - wall_theta )
@@ -344,12 +1024,12 @@ class discreteGame:
         return [ul, ur, lr, ll]
 
     def random_point_on_line(self, a, b):
-        val = random.random()
+        val = self.rng.random()
         nval = 1 - val
         return (a[0] * val + b[0] * nval, a[1] * val + b[1] * nval)
 
     def random_point_in_quadrilateral(self, corners):
-        vals = [random.random() for i in range(4)]
+        vals = [self.rng.random() for i in range(4)]
         s = sum(vals)
         fracs = [v / s for v in vals]
         x = sum([fracs[i] * corners[i][0] for i in range(4)])
@@ -364,11 +1044,11 @@ class discreteGame:
 
         points = []
         for i in range(num_points):
-            val = random.random()
+            val = self.rng.random()
             if val < corner_probability:
-                points.append(corners[random.randrange(0, 4)])
+                points.append(corners[self.rng.randrange(0, 4)])
             elif val < corner_probability + wall_probability:
-                ind1 = random.randrange(0, 4)
+                ind1 = self.rng.randrange(0, 4)
                 ind2 = (ind1 + 1) % 4
                 points.append(self.random_point_on_line(corners[ind1], corners[ind2]))
             else:
@@ -378,7 +1058,7 @@ class discreteGame:
     def random_wall_centers(self, num_walls=2, num_each=2):
         points = []
         for i in range(num_walls):
-            wall = random.choice(self.settings.walls)
+            wall = self.rng.choice(self.settings.walls)
             for point in self.random_wall_points(wall, num_each):
                 points.append(point)
         return points
@@ -386,8 +1066,8 @@ class discreteGame:
     def random_zoom_center(self, factor):
         offset = 1 / (2*factor)
         maxVal = 1 - offset
-        x = random.uniform(offset, maxVal)
-        y = random.uniform(offset, maxVal)
+        x = self.rng.uniform(offset, maxVal)
+        y = self.rng.uniform(offset, maxVal)
         return (x, y)
 
     def random_full_image_batch(self):
@@ -402,14 +1082,14 @@ class discreteGame:
         num_per_factor = num_gold + num_agent + num_walls*num_per_wall + num_random
         num_total = 1 + num_factors*num_per_factor + 1 # one normal, lots of closeups, one after jitter
         
-        gold_centers = [random.choice(self.settings.gold) for i in range(num_gold)]
+        gold_centers = [self.rng.choice(self.settings.gold) for i in range(num_gold)]
         agent_centers = [(self.settings.agent_x, self.settings.agent_y)]
         for i in range(num_agent - 1):
             agent_centers.append(self.random_center_near(agent_centers[0], scale=self.settings.agent_r))
         wall_centers = self.random_wall_centers(num_walls, num_per_wall)
 
-        rand_factor1 = random.uniform(2, 1/(4*self.settings.agent_r))
-        rand_factor2 = random.uniform(3, (1/(3*self.settings.gold_r)))
+        rand_factor1 = self.rng.uniform(2, 1/(4*self.settings.agent_r))
+        rand_factor2 = self.rng.uniform(3, (1/(3*self.settings.gold_r)))
 
         fac1List = gold_centers + agent_centers + wall_centers
         fac2List = gold_centers + agent_centers + wall_centers
@@ -418,7 +1098,7 @@ class discreteGame:
             fac1List.append(self.random_zoom_center(rand_factor1))
             fac2List.append(self.random_zoom_center(rand_factor2))
 
-        batch = np.zeros((num_total, self.settings.gameSize, self.settings.gameSize, 3))
+        batch = np.zeros((num_total,) + self.observation_shape())
         batch[0] = self.getData()
         batch[1:(num_per_factor+1)] = self.zoom(fac1List, rand_factor1)
         batch[(num_per_factor+1):-1] = self.zoom(fac2List, rand_factor2)
@@ -431,7 +1111,7 @@ class discreteGame:
     def random_small_image_batch(self):
         """just the original and some jitter"""
         num_total = 2
-        batch = np.zeros((num_total, self.settings.gameSize, self.settings.gameSize, 3))
+        batch = np.zeros((num_total,) + self.observation_shape())
         batch[0] = self.getData()
         self.random_jitter()
         batch[-1] = self.getData()
@@ -440,7 +1120,7 @@ class discreteGame:
     def random_full_image_set(self, numBatches=2, restrict_angles=False):
         """numBatches = full size / 20. Make it divisible by 20.
         Careful using this; this deletes the original game."""
-        res = np.zeros((numBatches*20, self.settings.gameSize, self.settings.gameSize, 3))
+        res = np.zeros((numBatches*20,) + self.observation_shape())
         ind = 0
         for batch in range(numBatches):
             if batch % 2 == 0:
@@ -467,23 +1147,23 @@ class discreteGame:
         rightlim = 1.0 - self.side_wall_width - Mx
         botlim = self.side_wall_width - my
         leftlim = self.side_wall_width - mx
-        return random.uniform(leftlim, rightlim), random.uniform(botlim, toplim)
+        return self.rng.uniform(leftlim, rightlim), self.rng.uniform(botlim, toplim)
 
     def random_wall(self, restrict_angles=False):
         wall_w = self.typical_wall_width
-        wall_h = random.uniform(self.typical_min_wall_height, self.typical_max_wall_height)
+        wall_h = self.rng.uniform(self.typical_min_wall_height, self.typical_max_wall_height)
         if restrict_angles:
-            wall_theta = random.randint(0, 1)*math.pi/2 # restrict it to right angles, to make it easier on the autoencoder
+            wall_theta = self.rng.randint(0, 1)*math.pi/2 # restrict it to right angles, to make it easier on the autoencoder
         else:
-            wall_theta = random.uniform(0, 2*math.pi) # probably overkill, I don't think the symmetries matter for computational efficiency, though.
+            wall_theta = self.rng.uniform(0, 2*math.pi) # probably overkill, I don't think the symmetries matter for computational efficiency, though.
         wall_x, wall_y = self.random_ul_corner(wall_w, wall_h, wall_theta)
         return [wall_x, wall_y, wall_w, wall_h, wall_theta]
 
     def random_side_walls(self):
         walls = []
         probability_exit = 0.5
-        if random.random() < probability_exit:
-            exit_wall = random.randint(0, 3)
+        if self.rng.random() < probability_exit:
+            exit_wall = self.rng.randint(0, 3)
         else:
             exit_wall = -1
         for i in range(4):# left wall; top wall; bottom wall; right wall
@@ -522,30 +1202,39 @@ class discreteGame:
 
     def random_walls(self, restrict_angles=False):
         walls = self.random_side_walls()
-        for i in range(random.randint(1, self.typical_max_wall_num)):
+        for i in range(self.rng.randint(1, self.typical_max_wall_num)):
             walls.append(self.random_wall(restrict_angles))
         return walls
 
     def random_valid_coords(self, walls, radius):
         valid = False
         while not valid:
-            test_x = random.uniform(self.side_wall_width, 1.0 - self.side_wall_width)
-            test_y = random.uniform(self.side_wall_width, 1.0 - self.side_wall_width)
+            test_x = self.rng.uniform(self.side_wall_width, 1.0 - self.side_wall_width)
+            test_y = self.rng.uniform(self.side_wall_width, 1.0 - self.side_wall_width)
             valid = self.full_wall_check(test_x, test_y, walls, radius)
         return (test_x, test_y)
 
     def random_gold(self, walls):
         gold = []
-        num_gold = random.randint(1, self.typical_max_gold_num)
+        num_gold = self.rng.randint(1, self.typical_max_gold_num)
         for i in range(num_gold):
             gold.append(self.random_valid_coords(walls, self.typical_gold_r))
         return gold
 
     def random_settings(self, gameSize=64, restrict_angles=False):
+        while True:
+            res = self._random_settings(gameSize, restrict_angles)
+            if self.typical_reachability is None:
+                return res
+            reachable = reachability.tag_level(res, self.typical_reachability_resolution)
+            if self.typical_reachability == 'tag' or reachable == len(res.gold):
+                return res
+
+    def _random_settings(self, gameSize=64, restrict_angles=False):
         walls = self.random_walls(restrict_angles)
         gold = self.random_gold(walls)
         agent_x, agent_y = self.random_valid_coords(walls, self.typical_agent_r)
-        direction = random.uniform(0, 2*math.pi)
+        direction = self.rng.uniform(0, 2*math.pi)
         res = Settings(gameSize=gameSize,
                        indicator_length = self.typical_indicator_length,
                        agent_r = self.typical_agent_r,
@@ -0,0 +1,269 @@
+import os
+import math
+import stat
+import time
+import socket
+import struct
+import asyncio
+from copy import deepcopy
+import numpy as np
+
+from discreteEngine2_5 import *
+
+# Hosts a pool of discreteGames behind a Unix domain socket (address = a path) or TCP (address = (host, port)), so
+# actors in other processes or containers on the same host can share them. Requests arriving while a batch is being
+# stepped are queued and stepped together in the next batch, and observations go back as raw uint8 bytes.
+#
+# Wire format, all little-endian:
+#   on connect, server -> client: b'DGES', num_envs (u32), ndim (u32), then ndim u32 observation dims
+#   request:  op (u8), env index (u32), action (i32)
+#   response: status (u8), reward (f32), terminated (u8), truncated (u8), payload length (u32), payload
+# The payload is the observation, or a utf-8 error message when status is nonzero. Responses on one connection come
+# back in request order, so a client can send several requests before reading any (see EnvClient.step_many).
+
+MAGIC = b'DGES'
+RESET, STEP, RANDOM_RESET = range(3)
+REQUEST = struct.Struct('<BIi')
+RESPONSE = struct.Struct('<BfBBI')
+HELLO = struct.Struct('<4sII')
+
+
+class EnvServer:
+    def __init__(self, settings_list, max_batch=256, **game_kwargs):
+        """settings_list: one Settings per hosted env (all with the same gameSize). Other keyword args go to every
+        discreteGame."""
+        self.envs = [discreteGame(deepcopy(settings), envMode=True, **game_kwargs) for settings in settings_list]
+        self.num_envs = len(self.envs)
+        self.max_batch = max_batch
+        self.obs_shape = self.envs[0].observation_shape()
+        self._obs = np.zeros((self.num_envs,) + self.obs_shape, dtype=np.uint8)
+        self._requests = None
+        self.batches = 0
+        self.requests_served = 0
+
+    def _hello(self):
+        return HELLO.pack(MAGIC, self.num_envs, len(self.obs_shape)) + struct.pack('<' + 'I'*len(self.obs_shape), *self.obs_shape)
+
+    def _run(self, batch):
+        """Steps a batch of (op, env, action, future). An env appearing twice is split into a later chunk, so every
+        response carries the frame right after its own request."""
+        while batch:
+            chunk, rest, seen = [], [], set()
+            for request in batch:
+                if request[1] in seen or rest:
+                    rest.append(request)
+                else:
+                    seen.add(request[1])
+                    chunk.append(request)
+            self._run_chunk(chunk)
+            batch = rest
+
+    def _run_chunk(self, chunk):
+        # One result per request: its reward, or an error message. A request that fails only fails itself.
+        results = []
+        for op, i, action, future in chunk: # physics for the whole chunk first, then the frames
+            if not 0 <= i < self.num_envs or op not in (RESET, STEP, RANDOM_RESET):
+                results.append("bad request: op " + str(op) + ", env " + str(i))
+            elif op == STEP and not 0 <= action < len(self.envs[i].actions):
+                results.append("bad action " + str(action) + " for env " + str(i))
+            else:
+                try:
+                    if op == STEP:
+                        results.append(self.envs[i].act(action))
+                    else:
+                        if op == RESET:
+                            self.envs[i].reset()
+                        else:
+                            self.envs[i].random_reset()
+                        results.append(0)
+                except Exception as e:
+                    results.append(type(e).__name__ + ": " + str(e))
+        for (op, i, action, future), result in zip(chunk, results):
+            if not isinstance(result, str):
+                try:
+                    self.envs[i].write_frame(self._obs[i])
+                except Exception as e:
+                    result = type(e).__name__ + ": " + str(e)
+            if isinstance(result, str):
+                future.set_result(self._error(result))
+            else:
+                future.set_result(RESPONSE.pack(0, result, 0, 0, self._obs[i].nbytes) + self._obs[i].tobytes())
+
+    def _error(self, message):
+        payload = message.encode()
+        return RESPONSE.pack(1, 0, 0, 0, len(payload)) + payload
+
+    async def _batcher(self):
+        while True:
+            batch = [await self._requests.get()]
+            while len(batch) < self.max_batch and not self._requests.empty():
+                batch.append(self._requests.get_nowait())
+            self._run(batch)
+            self.batches += 1
+            self.requests_served += len(batch)
+
+    async def _handle(self, reader, writer):
+        writer.write(self._hello())
+        responses = asyncio.Queue()
+        async def respond():
+            while True:
+                future = await responses.get()
+                if future is None:
+                    break
+                writer.write(await future)
+                if responses.empty():
+                    await writer.drain()
+        responder = asyncio.ensure_future(respond())
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                op, i, action = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                future = loop.create_future()
+                await self._requests.put((op, i, action, future))
+                await responses.put(future)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass # client went away
+        await responses.put(None)
+        await responder
+        writer.close()
+
+    async def start(self, address):
+        """Starts listening; address is a filesystem path (Unix socket) or a (host, port) pair."""
+        if isinstance(address, str) and os.path.exists(address):
+            if not stat.S_ISSOCK(os.stat(address).st_mode):
+                raise FileExistsError(address + " exists and is not a socket")
+            os.unlink(address) # stale socket from an earlier run
+        self._requests = asyncio.Queue()
+        self._batch_task = asyncio.ensure_future(self._batcher())
+        if isinstance(address, str):
+            self._server = await asyncio.start_unix_server(self._handle, path=address)
+        else:
+            self._server = await asyncio.start_server(self._handle, address[0], address[1])
+        return self._server
+
+    async def _serve_forever(self, address):
+        server = await self.start(address)
+        async with server:
+            await server.serve_forever()
+
+    def serve(self, address):
+        asyncio.run(self._serve_forever(address))
+
+
+class EnvClient:
+    """Blocking client, one socket per actor. Observations are numpy arrays over the received bytes."""
+    def __init__(self, address, timeout=None):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        magic, self.num_envs, ndim = HELLO.unpack(self._recv(HELLO.size))
+        assert magic == MAGIC, "not a discreteGame env server"
+        self.obs_shape = struct.unpack('<' + 'I'*ndim, self._recv(4*ndim))
+
+    def _recv(self, n):
+        buf = bytearray(n)
+        view = memoryview(buf)
+        while n:
+            got = self.sock.recv_into(view[len(buf) - n:], n)
+            if not got:
+                raise ConnectionError("env server closed the connection")
+            n -= got
+        return buf
+
+    def _read_response(self):
+        status, reward, terminated, truncated, length = RESPONSE.unpack(self._recv(RESPONSE.size))
+        payload = self._recv(length)
+        if status:
+            return ValueError(payload.decode())
+        obs = np.frombuffer(payload, dtype=np.uint8).reshape(self.obs_shape)
+        return obs, reward, bool(terminated), bool(truncated), {}
+
+    def request_many(self, requests):
+        """Sends every (op, env, action) before reading any response, so the server can batch them."""
+        self.sock.sendall(b''.join(REQUEST.pack(op, i, action) for op, i, action in requests))
+        results = [self._read_response() for request in requests] # read them all first, to stay in sync
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def step(self, env, actionIndex):
+        return self.request_many([(STEP, env, actionIndex)])[0]
+
+    def step_many(self, envs, actions):
+        return self.request_many([(STEP, i, a) for i, a in zip(envs, actions)])
+
+    def reset(self, env, randomize=False):
+        obs = self.request_many([(RANDOM_RESET if randomize else RESET, env, 0)])[0][0]
+        return obs, {}
+
+    def close(self):
+        self.sock.close()
+
+
+def _serve_process(settings_list, address, game_kwargs):
+    EnvServer(settings_list, **game_kwargs).serve(address)
+
+def _client_process(address, envs, num_steps, seed, results):
+    import random
+    rng = random.Random(seed)
+    client = EnvClient(address)
+    start = time.perf_counter()
+    for t in range(num_steps):
+        client.step_many(envs, [rng.randint(0, 4) for i in envs])
+    results.put(len(envs)*num_steps / (time.perf_counter() - start))
+    client.close()
+
+def _connectable(address, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            EnvClient(address).close()
+            return True
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.05)
+    return False
+
+def benchmark(num_envs=16, num_clients=4, num_steps=300, gameSize=64, address='/tmp/discrete_env_server.sock', **game_kwargs):
+    """Env steps per second with observations: in-process stepping vs. num_clients client processes sharing a server."""
+    import random
+    import multiprocessing
+    from levels.skeleton2_5 import settings_from_level
+    settings_list = [settings_from_level('tool_use_advanced', gameSize) for i in range(num_envs)]
+
+    envs = [discreteGame(deepcopy(settings), envMode=True, **game_kwargs) for settings in settings_list]
+    start = time.perf_counter()
+    for t in range(num_steps):
+        for env in envs:
+            env.step(random.randint(0, 4))
+    local = num_envs*num_steps / (time.perf_counter() - start)
+
+    server = multiprocessing.Process(target=_serve_process, args=(settings_list, address, game_kwargs), daemon=True)
+    server.start()
+    try:
+        assert _connectable(address), "env server did not come up"
+        results = multiprocessing.Queue()
+        per_client = math.ceil(num_envs / num_clients)
+        clients = [multiprocessing.Process(target=_client_process,
+                                           args=(address, list(range(k*per_client, min(num_envs, (k + 1)*per_client))), num_steps, k, results))
+                   for k in range(num_clients)]
+        for client in clients:
+            client.start()
+        remote = sum(results.get() for client in clients)
+        for client in clients:
+            client.join()
+    finally:
+        server.terminate()
+        server.join()
+    return {'in_process' : local, 'server' : remote}
+
+
+if __name__ == "__main__":
+    for gameSize in (64, 256):
+        rates = benchmark(gameSize=gameSize)
+        print("gameSize " + str(gameSize) + ": in-process " + str(round(rates['in_process'])) + " steps/s, server " +
+              str(round(rates['server'])) + " steps/s")
@@ -0,0 +1,134 @@
+import math
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from discreteEngine2_5 import *
+
+# Policy evaluation over a level set, fanned out over a process pool. The episodes (level x episode) are cut into
+# batches of up to batch_size; a worker plays one batch in lockstep, with one policy call per step on the stacked
+# observations of the episodes still running. An episode ends when its gold is gone or after max_steps actions.
+#
+# policy(obs) takes a (n,) + observation_shape uint8 batch and returns n action indices. With workers > 0 it is
+# pickled into every worker process, so it has to be picklable (a module-level function, or an object whose
+# class is importable); workers=0 plays everything in this process instead.
+#
+# Random levels go to the workers as seeds and are generated there, the way random_reset(seed=...) does it, so a
+# level set is the same in every run and nothing but the seed is pickled.
+
+# Two-sided 95% Student t quantiles by degrees of freedom; past the table the normal 1.96 is close enough.
+T_95 = [None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145,
+        2.131, 2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def level_set(sources=('levels', 'dict_levels', 'random'), num_random=200, gameSize=64, seed=0):
+    """[(name, level)], level being a Settings or, for random levels, an int seed."""
+    res = []
+    if 'levels' in sources:
+        res += [('levels/' + name, settings) for name, settings in all_level_settings(gameSize).items()]
+    if 'dict_levels' in sources:
+        res += [('dict_levels/' + name, settings) for name, settings in dict_level_settings(gameSize).items()]
+    if 'random' in sources:
+        res += [('random/%d' % (seed + k), seed + k) for k in range(num_random)]
+    return res
+
+def confidence_interval(values):
+    """(mean, half-width of the 95% t interval); the half-width is 0 for fewer than two values."""
+    n = len(values)
+    mean = float(np.mean(values)) if n else 0.0
+    if n < 2:
+        return mean, 0.0
+    t = T_95[n - 1] if n - 1 < len(T_95) else 1.96
+    return mean, t * float(np.std(values, ddof=1)) / math.sqrt(n)
+
+
+def _play(policy, jobs, max_steps, gameSize, game_kwargs):
+    """Plays a batch of (name, level, episode seed) jobs together; returns [(name, return, length)]."""
+    games = []
+    for name, level, seed in jobs:
+        if isinstance(level, int):
+            game = discreteGame(Settings(gameSize), envMode=True, **game_kwargs)
+            game.random_reset(seed=level)
+        else:
+            game = discreteGame(deepcopy(level), envMode=True, **game_kwargs)
+            game.reset()
+        games.append(game)
+    random.seed(jobs[0][2]) # for stochastic policies
+    np.random.seed(jobs[0][2] % 2**32)
+    lengths = [0]*len(games)
+    active = [i for i, game in enumerate(games) if game.settings.gold]
+    obs = np.empty((len(games),) + games[0].observation_shape(), dtype=np.uint8)
+    for t in range(max_steps):
+        if not active:
+            break
+        for k, i in enumerate(active):
+            games[i].write_frame(obs[k])
+        actions = policy(obs[:len(active)])
+        for k, i in enumerate(active):
+            games[i].act(int(actions[k]))
+            lengths[i] += 1
+        active = [i for i in active if games[i].settings.gold]
+    return [(name, float(game.reward), lengths[i]) for i, ((name, level, seed), game) in enumerate(zip(jobs, games))]
+
+def evaluate(policy, levels=None, episodes=1, max_steps=500, workers=None, batch_size=32, seed=0, gameSize=64,
+             **game_kwargs):
+    """Runs `episodes` episodes of `policy` on each of `levels` (default: level_set(gameSize=gameSize)).
+    workers: process count (None: one per CPU; 0: no pool). Other keyword args go to every discreteGame.
+    Returns {level name : stats}, stats holding the returns and lengths as arrays plus the mean and 95% interval
+    half-width of each (return_mean, return_ci, length_mean, length_ci)."""
+    if levels is None:
+        levels = level_set(gameSize=gameSize, seed=seed)
+    jobs = [(name, level, seed*1000003 + k*episodes + e) for k, (name, level) in enumerate(levels) for e in range(episodes)]
+    batches = [jobs[k:k + batch_size] for k in range(0, len(jobs), batch_size)]
+    args = (max_steps, gameSize, game_kwargs)
+    if workers == 0:
+        played = [_play(policy, batch, *args) for batch in batches]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            played = list(pool.map(_play, [policy]*len(batches), batches, *[[arg]*len(batches) for arg in args]))
+    outcomes = {name : ([], []) for name, level in levels}
+    for batch in played:
+        for name, ret, length in batch:
+            outcomes[name][0].append(ret)
+            outcomes[name][1].append(length)
+    results = {}
+    for name, (returns, lengths) in outcomes.items():
+        return_mean, return_ci = confidence_interval(returns)
+        length_mean, length_ci = confidence_interval(lengths)
+        results[name] = {'episodes' : len(returns), 'returns' : np.array(returns, dtype=np.float32),
+                         'lengths' : np.array(lengths, dtype=np.int32), 'return_mean' : return_mean,
+                         'return_ci' : return_ci, 'length_mean' : length_mean, 'length_ci' : length_ci}
+    return results
+
+def summary(results):
+    """One line per level, plus all random levels pooled into one."""
+    lines = []
+    pooled = {'returns' : [], 'lengths' : []}
+    for name, stats in results.items():
+        if name.startswith('random/'):
+            pooled['returns'] += list(stats['returns'])
+            pooled['lengths'] += list(stats['lengths'])
+            continue
+        lines.append("%-30s return %6.2f +- %5.2f  length %6.1f +- %5.1f" % (name, stats['return_mean'], stats['return_ci'],
+                                                                         stats['length_mean'], stats['length_ci']))
+    if pooled['returns']:
+        return_mean, return_ci = confidence_interval(pooled['returns'])
+        length_mean, length_ci = confidence_interval(pooled['lengths'])
+        lines.append("%-30s return %6.2f +- %5.2f  length %6.1f +- %5.1f" % ('random (%d episodes)' % len(pooled['returns']),
+                                                                         return_mean, return_ci, length_mean, length_ci))
+    return "\n".join(lines)
+
+
+def random_policy(obs):
+    return np.random.randint(0, 5, size=len(obs))
+
+
+if __name__ == "__main__":
+    import os
+    levels = level_set(num_random=100)
+    for workers in (0, os.cpu_count()):
+        start = time.perf_counter()
+        results = evaluate(random_policy, levels, episodes=4, max_steps=200, workers=workers)
+        print("workers %d: %.1f s" % (workers, time.perf_counter() - start))
+    print(summary(results))
@@ -0,0 +1,46 @@
+import numpy as np
+
+# Structured replacement for printing from inside the step loop. Games append (kind, source, step, value) tuples to an
+# attached EventBuffer, which a trainer drains in bulk as one numpy record array. With no buffer attached (the default)
+# nothing is recorded and nothing is printed.
+#   GOLD         value = the game's running reward after the pickup
+#   WALL_CONTACT value = how far the blocked step actually moved, in world units
+#   EPISODE_END  value = the episode's total reward; step = number of actions taken. Sent when the game is reset.
+
+GOLD, WALL_CONTACT, EPISODE_END = range(3)
+EVENT_NAMES = ['gold', 'wall_contact', 'episode_end']
+
+EVENT_DTYPE = np.dtype([('kind', np.uint8), ('source', np.uint32), ('step', np.uint32), ('value', np.float32)])
+
+
+class EventBuffer:
+    def __init__(self, capacity=1 << 20):
+        """Holds at most `capacity` events between drains; later ones are counted in self.dropped and discarded."""
+        self.capacity = capacity
+        self.dropped = 0
+        self._events = []
+
+    def attach(self, game, source=0):
+        """source: tags this game's events, e.g. its index in a vec env sharing one buffer."""
+        game.events = self
+        game.event_source = source
+
+    def append(self, kind, source, step, value=0):
+        if len(self._events) < self.capacity:
+            self._events.append((kind, source, step, value))
+        else:
+            self.dropped += 1
+
+    def __len__(self):
+        return len(self._events)
+
+    def drain(self):
+        """Every event since the last drain, oldest first, as a record array with EVENT_DTYPE fields."""
+        events = np.array(self._events, dtype=EVENT_DTYPE)
+        self._events = []
+        return events
+
+    def counts(self, events):
+        """Per-kind totals of a drained array, keyed by EVENT_NAMES."""
+        totals = np.bincount(events['kind'], minlength=len(EVENT_NAMES))
+        return {name : int(total) for name, total in zip(EVENT_NAMES, totals)}
@@ -0,0 +1,50 @@
+import numpy as np
+
+# Frame stacking without concatenation. Frames go into a buffer with some spare slots, and the stack is always
+# the contiguous slice ending at the newest frame, so it can be handed out as a view. When the write position
+# reaches the end, the last k-1 frames are moved to the front: one copy of k-1 frames every `spare` steps.
+
+
+class FrameRing:
+    def __init__(self, k, frame_shape, dtype=np.uint8, batch=None, spare=None):
+        """batch: if given, one ring per env in a leading axis, and the stack view is (batch, k) + frame_shape."""
+        if spare is None:
+            spare = 4*k
+        self.k = k
+        self.length = k - 1 + spare
+        self.batch = batch
+        if batch is None:
+            self.buffer = np.zeros((self.length,) + tuple(frame_shape), dtype=dtype)
+        else:
+            self.buffer = np.zeros((batch, self.length) + tuple(frame_shape), dtype=dtype)
+        self.t = self.k - 1 # index of the newest frame
+
+    def _slots(self, start, stop):
+        if self.batch is None:
+            return self.buffer[start:stop]
+        return self.buffer[:, start:stop]
+
+    def next_slot(self):
+        """Advances the ring and returns the (writable) slot for the newest frame."""
+        if self.t + 1 == self.length:
+            self._slots(0, self.k - 1)[...] = self._slots(self.length - self.k + 1, self.length)
+            self.t = self.k - 2
+        self.t += 1
+        return self.newest()
+
+    def newest(self):
+        if self.batch is None:
+            return self.buffer[self.t]
+        return self.buffer[:, self.t]
+
+    def view(self):
+        """The k most recent frames, oldest first. Later pushes overwrite it; copy to keep."""
+        return self._slots(self.t - self.k + 1, self.t + 1)
+
+    def fill_history(self, index=None):
+        """After a reset: repeat the newest frame over the whole stack (for one env, if batched)."""
+        start = self.t - self.k + 1
+        if self.batch is None:
+            self.buffer[start:self.t] = self.buffer[self.t]
+        else:
+            self.buffer[index, start:self.t] = self.buffer[index, self.t]
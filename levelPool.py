@@ -0,0 +1,92 @@
+import queue
+import random
+import threading
+import multiprocessing
+
+from discreteEngine2_5 import *
+
+# Pre-generates random_settings levels in the background so random_reset never waits on the rejection sampling in
+# random_valid_coords. A thread is enough to move that work off episode boundaries; use_process=True moves it off
+# the GIL as well. When the queue is empty, get() falls back to generating synchronously and counts a miss.
+
+
+def random_params(game):
+    """The typical_* knobs random_settings reads, so a generator can be set up like `game`."""
+    return {k : v for k, v in vars(game).items() if k.startswith('typical') or k == 'side_wall_width'}
+
+def _generator(params, gameSize, physics='python'):
+    gen = discreteGame(Settings(gameSize), envMode=True, physics=physics)
+    for k, v in params.items():
+        setattr(gen, k, v)
+    return gen
+
+def _process_worker(levels, stop, params, gameSize, restrict_angles):
+    random.seed() # don't replay the parent's generator state after a fork
+    gen = _generator(params, gameSize)
+    while not stop.is_set():
+        settings = gen.random_settings(gameSize, restrict_angles)
+        while not stop.is_set():
+            try:
+                levels.put(settings, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+
+
+class LevelPool:
+    def __init__(self, template, maxsize=64, gameSize=None, restrict_angles=False, use_process=False):
+        """template: a discreteGame whose typical_* parameters the generated levels follow."""
+        if gameSize is None:
+            gameSize = template.settings.gameSize
+        self.gameSize = gameSize
+        self.restrict_angles = restrict_angles
+        self.hits = 0
+        self.misses = 0
+        params = random_params(template)
+        self._sync_gen = _generator(params, gameSize, template.physics) # for misses; owned by the calling thread
+        if use_process:
+            self._levels = multiprocessing.Queue(maxsize)
+            self._stop = multiprocessing.Event()
+            self._worker = multiprocessing.Process(target=_process_worker,
+                                                   args=(self._levels, self._stop, params, gameSize, restrict_angles),
+                                                   daemon=True)
+        else:
+            self._levels = queue.Queue(maxsize)
+            self._stop = threading.Event()
+            self._thread_gen = _generator(params, gameSize, template.physics) # not shared with any stepping game
+            self._thread_gen.rng = random.Random() # keeps off the random module, which seeded resets rely on
+            self._worker = threading.Thread(target=self._thread_worker, daemon=True)
+        self._worker.start()
+
+    def _thread_worker(self):
+        while not self._stop.is_set():
+            settings = self._thread_gen.random_settings(self.gameSize, self.restrict_angles)
+            while not self._stop.is_set():
+                try:
+                    self._levels.put(settings, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def attach(self, game):
+        game.level_pool = self
+
+    def matches(self, gameSize, restrict_angles):
+        return gameSize == self.gameSize and restrict_angles == self.restrict_angles
+
+    def get(self):
+        try:
+            settings = self._levels.get_nowait()
+            self.hits += 1
+        except queue.Empty:
+            settings = self._sync_gen.random_settings(self.gameSize, self.restrict_angles)
+            self.misses += 1
+        return settings
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits' : self.hits, 'misses' : self.misses, 'hit_rate' : self.hits / total if total else 0.0}
+
+    def close(self):
+        self._stop.set()
+        self._worker.join()
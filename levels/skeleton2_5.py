@@ -1,13 +1,15 @@
 from math import pi
 
 class Settings:
-    def __init__(self, gameSize=64, direction=0, agent_x=0.5, agent_y=0.5, agent_r=0.05, gold_r=0.01, gold=None, walls=None, indicator_length=None):
+    def __init__(self, gameSize=64, direction=0, agent_x=0.5, agent_y=0.5, agent_r=0.05, gold_r=0.01, gold=None, walls=None, indicator_length=None, metadata=None):
         if indicator_length is None:
             indicator_length = agent_r
         if gold is None:
             gold = []
         if walls is None:
             walls = []
+        if metadata is None:
+            metadata = {} # free-form facts about the level, e.g. reachability.tag_level's gold counts
         self.gameSize = gameSize
         self.indicator_length = indicator_length
         self.direction = direction
@@ -17,6 +19,7 @@ class Settings:
         self.gold_r = gold_r
         self.gold = gold
         self.walls = walls
+        self.metadata = metadata
 
 
 
@@ -57,3 +60,46 @@ BIG_tool_use_advanced_2_5 = \
                          [100/800.0, 100/800.0, 50/800.0, 450/800.0, -pi/6]
                      ]
             )
+
+
+# The pixel-unit level files in this package (written for the 800x800 engines), converted to Settings.
+LEVEL_NAMES = ['initial', 'intermediate', 'skilled', 'tantalus', 'bottom_half', 'top_half', 'terminal', 'tool_use_advanced']
+
+def settings_from_level(name, gameSize=64, scale=800.0):
+    from importlib import import_module
+    level = import_module('levels.' + name)
+    return Settings(gameSize,
+                    indicator_length = 400/scale,
+                    agent_x = level.agent_x/scale,
+                    agent_y = level.agent_y/scale,
+                    agent_r = level.agent_r/scale,
+                    gold_r = level.gold_r/scale,
+                    gold = [[x/scale, y/scale] for x, y in getattr(level, 'gold', [])],
+                    walls = [[x/scale, y/scale, w/scale, h/scale, theta] for x, y, w, h, theta in level.walls])
+
+def all_level_settings(gameSize=64):
+    return {name : settings_from_level(name, gameSize) for name in LEVEL_NAMES}
+
+# The same levels as arg_dicts, in dict_levels/. Some of those files don't parse; dict_level_settings skips them.
+DICT_LEVEL_NAMES = ['initial', 'intermediate', 'skilled', 'tantalus', 'bottom_half', 'top_half', 'terminal', 'tool_use_advanced']
+
+def settings_from_dict_level(name, gameSize=64, scale=800.0):
+    from importlib import import_module
+    arg_dict = import_module('dict_levels.' + name).arg_dict
+    return Settings(gameSize,
+                    indicator_length = 400/scale,
+                    agent_x = arg_dict['initial_agent_x']/scale,
+                    agent_y = arg_dict['initial_agent_y']/scale,
+                    agent_r = arg_dict['agent_r']/scale,
+                    gold_r = arg_dict['gold_r']/scale,
+                    gold = [[x/scale, y/scale] for x, y in arg_dict.get('initial_gold', [])],
+                    walls = [[x/scale, y/scale, w/scale, h/scale, theta] for x, y, w, h, theta in arg_dict['walls']])
+
+def dict_level_settings(gameSize=64):
+    res = {}
+    for name in DICT_LEVEL_NAMES:
+        try:
+            res[name] = settings_from_dict_level(name, gameSize)
+        except SyntaxError:
+            pass
+    return res
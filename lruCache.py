@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+# Small LRU map with hit/miss counters, for the memoization caches on discreteGame.
+# Bounded by entry count, by total size in bytes (as measured by `sizeof`), or both.
+
+
+class LRUCache:
+    def __init__(self, maxsize=None, max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+        return value
+
+    def _size(self, value):
+        return self.sizeof(value) if self.sizeof is not None else 0
+
+    def put(self, key, value):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.nbytes -= self._size(old)
+        self._data[key] = value
+        self.nbytes += self._size(value)
+        while self._data and ((self.maxsize and len(self._data) > self.maxsize) or
+                              (self.max_bytes and self.nbytes > self.max_bytes)):
+            key, evicted = self._data.popitem(last=False)
+            self.nbytes -= self._size(evicted)
+
+    def clear(self):
+        self._data.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits' : self.hits,
+                'misses' : self.misses,
+                'hit_rate' : self.hits / total if total else 0.0,
+                'size' : len(self._data),
+                'bytes' : self.nbytes}
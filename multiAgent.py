@@ -0,0 +1,108 @@
+import math
+import random
+import numpy as np
+
+from discreteEngine2_5 import *
+
+# Several agents in one level. There is a single Settings object, so the walls, the gold list, the wall layer, the
+# signed distance field and the numba walls array all exist once, however many agents there are. Each agent only
+# owns a pose; to act or render for agent i, its pose is swapped into self.settings and the usual discreteGame code
+# runs unchanged.
+#
+# Agents do not collide with each other. Within a joint step they move in index order, so if two agents reach the
+# same gold in one step, the lower index gets it. Each agent's observation shows every agent's body but only its
+# own indicator line.
+
+
+class multiAgentGame(discreteGame):
+    def __init__(self, settings=None, num_agents=2, poses=None, **game_kwargs):
+        """poses: optional list of (agent_x, agent_y, direction), one per agent. By default agent 0 starts from the
+        settings' pose and the others from random free spots, chosen again on every new level.
+        Other keyword args go to discreteGame; only envMode is supported."""
+        assert game_kwargs.pop('envMode', True), "multiAgentGame has no human display"
+        assert not game_kwargs.get('incremental'), "incremental rendering tracks a single agent"
+        assert not game_kwargs.get('frame_stack'), "frame_stack keeps one ring per game; stack the joint observations instead"
+        assert not game_kwargs.get('frame_cache_bytes'), "the frame cache key does not include the other agents"
+        self.num_agents = num_agents
+        self.active = 0
+        self.poses = []
+        self._fixed_poses = poses
+        self._poses_serial = None
+        super().__init__(settings, envMode=True, **game_kwargs)
+        self.rewards = np.zeros(num_agents, dtype=np.float32)
+        self._place_agents()
+        self._start_agents()
+
+    def _place_agents(self):
+        if self._fixed_poses is not None:
+            assert len(self._fixed_poses) == self.num_agents, "need one pose per agent"
+            self.initial_poses = [list(pose) for pose in self._fixed_poses]
+        else:
+            self.initial_poses = [[self.initial.agent_x, self.initial.agent_y, self.initial.direction]]
+            for i in range(1, self.num_agents):
+                agent_x, agent_y = self.random_valid_coords(self.initial.walls, self.initial.agent_r)
+                self.initial_poses.append([agent_x, agent_y, random.uniform(0, 2*math.pi)])
+        self._poses_serial = self._level_serial
+
+    def _start_agents(self):
+        self.poses = [list(pose) for pose in self.initial_poses]
+        self.active = None
+        for i in range(self.num_agents): # gold under a starting position is collected, unrewarded, as in reset()
+            self.use_agent(i)
+            self.gold_update()
+        self.use_agent(0)
+
+    def use_agent(self, i):
+        """Makes agent i the one self.settings describes (and so the one act() moves and getData() renders for)."""
+        if i == self.active:
+            return
+        if self.active is not None:
+            self.poses[self.active] = [self.settings.agent_x, self.settings.agent_y, self.settings.direction]
+        self.settings.agent_x, self.settings.agent_y, self.settings.direction = self.poses[i]
+        self.active = i
+        self.redraw()
+
+    def other_agents(self):
+        return [(pose[0], pose[1]) for i, pose in enumerate(self.poses) if i != self.active]
+
+    def reset(self):
+        self.end_episode()
+        self._sync_level()
+        self.settings = deepcopy(self.initial)
+        self.reward = 0
+        self.invalidate_render()
+        if self._poses_serial != self._level_serial: # the level was replaced
+            self._place_agents()
+        self._start_agents()
+        return self.observations(), {}
+
+    def joint_act(self, actions):
+        """Applies one action per agent, in index order; returns the per-agent rewards (a reused array)."""
+        for i, actionIndex in enumerate(actions):
+            self.use_agent(i)
+            self.rewards[i] = self.act(actionIndex)
+        self.use_agent(0)
+        return self.rewards
+
+    def step(self, actions):
+        rewards = self.joint_act(actions)
+        terminated = False # dummies for now
+        truncated = False
+        info = {}
+        return self.observations(), rewards, terminated, truncated, info
+
+    def observations(self, out=None):
+        """One frame per agent, shape (num_agents,) + observation_shape()."""
+        if out is None:
+            out = np.zeros((self.num_agents,) + self.observation_shape(), dtype=np.uint8)
+        for i in range(self.num_agents):
+            self.use_agent(i)
+            self._stale = True # same pose as before, but a different set of other agents
+            self.write_frame(out[i])
+        self.use_agent(0)
+        return out
+
+    def joint_state(self):
+        """Every pose plus the shared gold mask: ((x, y, direction) per agent, gold_mask)."""
+        self.poses[self.active] = [self.settings.agent_x, self.settings.agent_y, self.settings.direction]
+        return tuple(tuple(pose) for pose in self.poses), self.compact_state()[3]
@@ -0,0 +1,223 @@
+import os
+import math
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+import physicsKernels
+from discreteEngine2_5 import HEADING_COS, HEADING_SIN, HEADING_STEP, NUM_HEADINGS
+
+# Shortest paths to gold, for expert demonstrations. Poses are quantized to (i, j, h): the agent's centre in cell (i, j)
+# of a resolution x resolution grid and its direction rounded to heading h of discreteEngine2_5's HEADING_ANGLES.
+# Each quantized pose gets the successor of every action, worked out from the cell centre with the engine's own
+# step rule (biggest_step with the same lim and min_step, via physicsKernels) and swivel rule (one heading either
+# way). A BFS backwards from the poses that collect gold then gives, per remaining-gold mask, the number of actions to
+# the nearest gold and the action that gets there; after that, the oracle is a table lookup per step.
+#
+# The graph is an approximation of the continuous game (the agent is not at its cell centre), so act() scores each
+# action by where it really leads from the exact pose, and a demonstration may take more steps than the table says.
+# The grid needs cells well under a step (1/64) for that to work; the default is 128. Build cost is a few batched
+# collision sweeps (about a second with numba; without it physicsKernels runs as plain Python and takes far longer,
+# which is what oracle_for's caches are for).
+
+UNREACHABLE = np.iinfo(np.int32).max
+NOOP, FORWARD, BACKWARD, CLOCK, ANTICLOCK = range(5)
+
+
+class PathOracle:
+    def __init__(self, settings, resolution=128, lim=1.0/64, graph_path=None):
+        """settings: the level as it starts (gold masks are relative to settings.gold, like compact_state's).
+        lim: the step length the game uses (stepForward's default).
+        graph_path: .npz to load the successor graph from, or to save it to after building it."""
+        self.resolution = resolution
+        self.gold = [tuple(coords) for coords in settings.gold]
+        self.pickup = settings.agent_r + settings.gold_r # spot_overlap_check's distance
+        self._tables = {}
+        self.walls = physicsKernels.walls_array(settings.walls)
+        self.agent_r = settings.agent_r
+        self.lim = lim
+        self.min_step = 1.0/settings.gameSize
+        if graph_path is not None and os.path.exists(graph_path):
+            self.load_graph(graph_path)
+        else:
+            self.successors = self._build(settings, lim)
+            if graph_path is not None:
+                self.save(graph_path)
+
+    def _build(self, settings, lim):
+        R, H = self.resolution, NUM_HEADINGS
+        i, j, h = np.meshgrid(np.arange(R), np.arange(R), np.arange(H), indexing='ij')
+        i, j, h = i.ravel(), j.ravel(), h.ravel()
+        xs = (i + 0.5) / R
+        ys = (j + 0.5) / R
+        c = np.array(HEADING_COS)[h]
+        s = np.array(HEADING_SIN)[h]
+        walls = physicsKernels.walls_array(settings.walls)
+        min_step = 1.0/settings.gameSize
+        # The agent can be anywhere in its cell, so plan with the agent inflated by half a cell diagonal wherever
+        # that fits: a move the graph allows from the centre then also works from the rest of the cell. Poses too
+        # close to a wall for that use the true radius, so that they still lead somewhere.
+        margin = 0.5*np.sqrt(2)/R
+        self.free = physicsKernels.full_wall_check_many(xs, ys, walls, settings.agent_r)
+        roomy = physicsKernels.full_wall_check_many(xs, ys, walls, settings.agent_r + margin)
+
+        succ = np.empty((5, xs.size), dtype=np.int32)
+        index = np.arange(xs.size)
+        succ[NOOP] = index
+        for action, sign in ((FORWARD, 1), (BACKWARD, -1)):
+            step = physicsKernels.biggest_step_many(xs, ys, sign*c, sign*s, lim, min_step, walls, settings.agent_r)
+            wide = physicsKernels.biggest_step_many(xs[roomy], ys[roomy], sign*c[roomy], sign*s[roomy], lim, min_step, walls, settings.agent_r + margin)
+            step[roomy] = wide
+            ni = np.clip(np.floor((xs + step*sign*c)*R).astype(np.int64), 0, R - 1)
+            nj = np.clip(np.floor((ys + step*sign*s)*R).astype(np.int64), 0, R - 1)
+            succ[action] = (ni*R + nj)*H + h
+        succ[CLOCK] = (i*R + j)*H + (h - 1) % H
+        succ[ANTICLOCK] = (i*R + j)*H + (h + 1) % H
+        succ[:, ~self.free] = index[~self.free] # poses inside walls never come up; keep them out of the search
+        return succ
+
+    def state(self, agent_x, agent_y, direction):
+        R = self.resolution
+        i = min(max(int(agent_x*R), 0), R - 1)
+        j = min(max(int(agent_y*R), 0), R - 1)
+        h = round(direction / HEADING_STEP) % NUM_HEADINGS
+        return (i*R + j)*NUM_HEADINGS + h
+
+    def _goals(self, gold_mask):
+        R = self.resolution
+        centres = (np.arange(R) + 0.5) / R
+        xs, ys = np.meshgrid(centres, centres, indexing='ij')
+        near = np.zeros((R, R), dtype=bool)
+        reach = self.pickup - 0.5*np.sqrt(2)/R # the whole cell collects, not just its centre
+        for k, (gold_x, gold_y) in enumerate(self.gold):
+            if (gold_mask >> k) & 1:
+                near |= (xs - gold_x)**2 + (ys - gold_y)**2 < reach**2
+        return np.repeat(near.ravel(), NUM_HEADINGS) & self.free
+
+    def _bfs(self, goals):
+        """Multi-source BFS over reversed edges; returns actions-to-goal per state."""
+        num_states = goals.size
+        sources = np.tile(np.arange(num_states), 4)
+        targets = self.successors[1:].ravel()
+        order = np.argsort(targets, kind='stable')
+        preds = sources[order]
+        starts = np.searchsorted(targets[order], np.arange(num_states + 1))
+        dist = np.full(num_states, UNREACHABLE, dtype=np.int32)
+        frontier = np.flatnonzero(goals)
+        dist[frontier] = 0
+        d = 0
+        while frontier.size:
+            d += 1
+            counts = starts[frontier + 1] - starts[frontier]
+            offsets = np.repeat(starts[frontier] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            candidates = np.unique(preds[offsets])
+            frontier = candidates[dist[candidates] == UNREACHABLE]
+            dist[frontier] = d
+        return dist
+
+    def tables(self, gold_mask=None):
+        """(distance, best action) per state for this set of remaining gold (bitmask over settings.gold; all of it by
+        default). Computed once per mask."""
+        if gold_mask is None:
+            gold_mask = (1 << len(self.gold)) - 1
+        tables = self._tables.get(gold_mask)
+        if tables is None:
+            dist = self._bfs(self._goals(gold_mask))
+            following = np.where(dist == UNREACHABLE, UNREACHABLE, dist)[self.successors[1:]]
+            best = (np.argmin(following, axis=0) + 1).astype(np.uint8)
+            best[(dist == 0) | (dist == UNREACHABLE)] = NOOP
+            tables = (dist, best)
+            self._tables[gold_mask] = tables
+        return tables
+
+    def distance(self, agent_x, agent_y, direction, gold_mask=None):
+        return int(self.tables(gold_mask)[0][self.state(agent_x, agent_y, direction)])
+
+    def best_action(self, agent_x, agent_y, direction, gold_mask=None):
+        return int(self.tables(gold_mask)[1][self.state(agent_x, agent_y, direction)])
+
+    def next_states(self, agent_x, agent_y, direction):
+        """Quantized result of each action from the exact pose (not the cell centre), by the same rules as _build."""
+        c = math.cos(direction)
+        s = math.sin(direction)
+        res = [self.state(agent_x, agent_y, direction)]
+        for sign in (1, -1):
+            step = physicsKernels.biggest_step(agent_x, agent_y, sign*c, sign*s, self.lim, self.min_step, self.walls, self.agent_r)
+            res.append(self.state(agent_x + step*sign*c, agent_y + step*sign*s, direction))
+        res.append(self.state(agent_x, agent_y, direction - HEADING_STEP))
+        res.append(self.state(agent_x, agent_y, direction + HEADING_STEP))
+        return res
+
+    def act(self, game, avoid=()):
+        """Best action for a discreteGame on this level. Looks up the table value of each action's actual outcome from
+        the game's exact pose (one collision check per move, no search), and takes the best one that doesn't lead
+        into `avoid` (e.g. states already visited; see demonstration) where the cell-centre graph and the real
+        dynamics disagree."""
+        agent_x, agent_y, direction, gold_mask = game.compact_state()
+        dist, best = self.tables(gold_mask)
+        here = self.state(agent_x, agent_y, direction)
+        if dist[here] == 0 or dist[here] == UNREACHABLE:
+            return NOOP
+        following = self.next_states(agent_x, agent_y, direction)
+        ranked = sorted((FORWARD, BACKWARD, CLOCK, ANTICLOCK),
+                        key=lambda actionIndex : (int(dist[following[actionIndex]]), actionIndex != best[here]))
+        for actionIndex in ranked:
+            if following[actionIndex] not in avoid:
+                return actionIndex
+        return ranked[0]
+
+    def save(self, path):
+        np.savez_compressed(path, successors=self.successors, free=self.free, resolution=self.resolution)
+
+    def load_graph(self, path):
+        data = np.load(path)
+        assert int(data['resolution']) == self.resolution, "saved graph has a different resolution"
+        self.successors = data['successors']
+        self.free = data['free']
+
+
+def demonstration(game, oracle, max_steps=500):
+    """Plays the oracle in `game` from its current state until the gold is gone, it gets stuck, or max_steps.
+    Returns the observations (before each action) and the actions, as arrays."""
+    frames, actions = [], []
+    visited = set()
+    gold_mask = None
+    for t in range(max_steps):
+        state = game.compact_state()
+        if state[3] != gold_mask: # new target; old states are fine to pass through again
+            gold_mask = state[3]
+            visited = set()
+        visited.add(oracle.state(state[0], state[1], state[2]))
+        actionIndex = oracle.act(game, visited)
+        if actionIndex == NOOP:
+            break
+        frames.append(game.getData().copy())
+        actions.append(actionIndex)
+        game.act(actionIndex)
+    return np.array(frames, dtype=np.uint8).reshape((-1,) + game.observation_shape()), np.array(actions, dtype=np.uint8)
+
+
+_oracles = OrderedDict()
+MAX_CACHED_ORACLES = 16
+
+def _level_key(settings, resolution):
+    return (tuple(tuple(params) for params in settings.walls), tuple(tuple(coords) for coords in settings.gold),
+            settings.agent_r, settings.gold_r, settings.gameSize, resolution)
+
+def oracle_for(settings, resolution=128, cache_dir=None):
+    """Shared, bounded cache keyed on the level's geometry. With cache_dir, the successor graph (the expensive part)
+    is also kept on disk, so other processes and later runs skip the collision sweep."""
+    key = _level_key(settings, resolution)
+    oracle = _oracles.get(key)
+    if oracle is not None:
+        _oracles.move_to_end(key)
+        return oracle
+    path = None
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, 'oracle_' + hashlib.sha1(repr(key).encode()).hexdigest() + '.npz')
+    oracle = PathOracle(settings, resolution, graph_path=path)
+    _oracles[key] = oracle
+    if len(_oracles) > MAX_CACHED_ORACLES:
+        _oracles.popitem(last=False)
+    return oracle
@@ -0,0 +1,70 @@
+import numpy as np
+
+from wallField import wall_distance
+
+# Which gold can the agent actually get to? Works on a grid of agent-centre positions over the unit square: a cell is
+# free when its centre is at least agent_r from every wall (the walls inflated by agent_r, i.e. what
+# full_wall_check tests), and the agent can reach every free cell 4-connected to its own. Swivels are always free, so
+# headings don't matter. A gold counts as reachable when some reachable cell is close enough to collect it.
+#
+# It is a grid approximation: gaps narrower than about a cell (1/resolution) may be judged wrong either way.
+
+
+def free_cells(walls, agent_r, resolution=64):
+    """(resolution, resolution) bool grid, indexed [x, y] like surfarray: can the agent's centre sit in this cell?"""
+    centres = (np.arange(resolution) + 0.5) / resolution
+    xs, ys = np.meshgrid(centres, centres, indexing='ij')
+    return wall_distance(xs, ys, walls) >= agent_r
+
+def flood_fill(free, start):
+    """All cells 4-connected to `start` through free cells, by repeated vectorized dilation."""
+    reached = np.zeros_like(free)
+    if not free[start]:
+        return reached
+    reached[start] = True
+    frontier = reached.copy()
+    while frontier.any():
+        grown = np.zeros_like(frontier)
+        grown[1:, :] |= frontier[:-1, :]
+        grown[:-1, :] |= frontier[1:, :]
+        grown[:, 1:] |= frontier[:, :-1]
+        grown[:, :-1] |= frontier[:, 1:]
+        frontier = grown & free & ~reached
+        reached |= frontier
+    return reached
+
+def _start_cell(free, agent_x, agent_y, resolution):
+    """The agent's own cell, or the nearest free cell to it (the agent is clear of walls, its cell centre may not be)."""
+    i = min(max(int(agent_x*resolution), 0), resolution - 1)
+    j = min(max(int(agent_y*resolution), 0), resolution - 1)
+    if free[i, j]:
+        return i, j
+    candidates = np.argwhere(free[max(i - 1, 0):i + 2, max(j - 1, 0):j + 2])
+    if len(candidates) == 0:
+        return i, j
+    centre = ((agent_x*resolution - 0.5) - max(i - 1, 0), (agent_y*resolution - 0.5) - max(j - 1, 0))
+    k = np.argmin(((candidates - centre)**2).sum(axis=1))
+    return candidates[k][0] + max(i - 1, 0), candidates[k][1] + max(j - 1, 0)
+
+def reachable_region(settings, resolution=64):
+    free = free_cells(settings.walls, settings.agent_r, resolution)
+    return flood_fill(free, _start_cell(free, settings.agent_x, settings.agent_y, resolution))
+
+def reachable_gold(settings, resolution=64):
+    """One bool per entry of settings.gold."""
+    region = reachable_region(settings, resolution)
+    cells = (np.argwhere(region) + 0.5) / resolution
+    reach = settings.agent_r + settings.gold_r # spot_overlap_check's pickup distance
+    res = []
+    for coords in settings.gold:
+        d2 = ((cells - np.asarray(coords, dtype=np.float64))**2).sum(axis=1)
+        res.append(bool(len(d2)) and bool(d2.min() < reach*reach))
+    return res
+
+def tag_level(settings, resolution=64):
+    """Records the analysis in settings.metadata and returns the number of reachable gold."""
+    reachable = reachable_gold(settings, resolution)
+    settings.metadata['reachable_gold'] = sum(reachable)
+    settings.metadata['gold_count'] = len(reachable)
+    settings.metadata['gold_reachable'] = reachable
+    return sum(reachable)
@@ -0,0 +1,131 @@
+from copy import deepcopy
+import numpy as np
+
+from discreteEngine2_5 import *
+
+# Replay buffer for pixel-based off-policy learning that never stores pixels.
+# Each transition is a level index, two compact states (pose + gold bitmask, see discreteGame.compact_state),
+# the action, reward and done flag: about 80 bytes, against 2*64*64*3 for a frame pair.
+# Observations are re-rendered in bulk when a batch is sampled.
+
+
+class StateReplayBuffer:
+    def __init__(self, capacity, gameSize=None, obs_mode='rgb'):
+        """gameSize: resolution of sampled observations; defaults to that of the first level added.
+        obs_mode: as in discreteGame; 'index' makes sampled batches a third of the size."""
+        self.capacity = capacity
+        self.gameSize = gameSize
+        self.obs_mode = obs_mode
+        self.size = 0
+        self.pos = 0
+
+        self.level = np.zeros(capacity, dtype=np.int32)
+        self.pose = np.zeros((capacity, 3), dtype=np.float64) # agent_x, agent_y, direction
+        self.gold_mask = np.zeros(capacity, dtype=np.uint64)
+        self.action = np.zeros(capacity, dtype=np.uint8)
+        self.reward = np.zeros(capacity, dtype=np.float32)
+        self.next_pose = np.zeros((capacity, 3), dtype=np.float64)
+        self.next_gold_mask = np.zeros(capacity, dtype=np.uint64)
+        self.done = np.zeros(capacity, dtype=bool)
+
+        # Levels are held by reference, keyed by the identity of the game's `initial` Settings.
+        # random_reset creates a new one each time; plain reset() keeps it, so repeated episodes share an entry.
+        # Each level counts the slots that refer to it, and once the ring has overwritten them all its index is freed
+        # (self.levels[index] = None) and reused, so the list stays no longer than the number of live levels.
+        self.levels = []
+        self._level_ids = {}
+        self._level_refs = []
+        self._free_levels = []
+
+        self._renderer = None
+        self._renderer_level = -1
+        self._batch = None
+
+    def level_index(self, game):
+        key = id(game.initial)
+        if key not in self._level_ids:
+            assert len(game.initial.gold) <= 64, "gold mask is stored as uint64"
+            if self._free_levels:
+                index = self._free_levels.pop()
+                self.levels[index] = game.initial
+            else:
+                index = len(self.levels)
+                self.levels.append(game.initial)
+                self._level_refs.append(0)
+            self._level_ids[key] = index
+            if self.gameSize is None:
+                self.gameSize = game.initial.gameSize
+        return self._level_ids[key]
+
+    def _release_level(self, level):
+        del self._level_ids[id(self.levels[level])]
+        self.levels[level] = None
+        self._free_levels.append(level)
+        if self._renderer_level == level:
+            self._renderer_level = -1
+
+    def add(self, level, state, action, reward, next_state, done):
+        i = self.pos
+        self._level_refs[level] += 1
+        if self.size == self.capacity: # overwriting slot i
+            old = self.level[i]
+            self._level_refs[old] -= 1
+            if self._level_refs[old] == 0:
+                self._release_level(old)
+        self.level[i] = level
+        self.pose[i] = state[:3]
+        self.gold_mask[i] = state[3]
+        self.action[i] = action
+        self.reward[i] = reward
+        self.next_pose[i] = next_state[:3]
+        self.next_gold_mask[i] = next_state[3]
+        self.done[i] = done
+        self.pos = (self.pos + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def step(self, game, actionIndex):
+        """Steps the game and stores the transition; returns whatever game.step returned."""
+        level = self.level_index(game)
+        state = game.compact_state()
+        obs, reward, terminated, truncated, info = game.step(actionIndex)
+        self.add(level, state, actionIndex, reward, game.compact_state(), terminated or truncated)
+        return obs, reward, terminated, truncated, info
+
+    ####### Rendering
+    def _load_level(self, level):
+        if level == self._renderer_level:
+            return
+        settings = deepcopy(self.levels[level])
+        settings.gameSize = self.gameSize
+        if self._renderer is None:
+            self._renderer = discreteGame(settings, envMode=True, obs_mode=self.obs_mode)
+        self._renderer.initial = self.levels[level] # gold masks are relative to this
+        self._renderer.settings = settings
+        self._renderer.invalidate_render()
+        self._renderer_level = level
+
+    def render(self, levels, poses, gold_masks, out):
+        """Draws each compact state into out[i]. Visits states grouped by level, so walls are rasterized once per level."""
+        for i in np.argsort(levels, kind='stable'):
+            self._load_level(levels[i])
+            self._renderer.load_compact_state((poses[i, 0], poses[i, 1], poses[i, 2], int(gold_masks[i])))
+            self._renderer.write_frame(out[i])
+        return out
+
+    def sample(self, batch_size):
+        """Uniform batch. obs / next_obs live in arrays reused by the next call with the same batch_size."""
+        assert self.size > 0, "buffer is empty"
+        if self._batch is None or self._batch[0].shape[0] != batch_size:
+            self._load_level(self.level[0]) # slot 0 is always filled
+            shape = (batch_size,) + self._renderer.observation_shape()
+            self._batch = (np.zeros(shape, dtype=np.uint8), np.zeros(shape, dtype=np.uint8))
+        obs, next_obs = self._batch
+        idx = np.random.randint(0, self.size, batch_size)
+        levels = self.level[idx]
+        self.render(levels, self.pose[idx], self.gold_mask[idx], obs)
+        self.render(levels, self.next_pose[idx], self.next_gold_mask[idx], next_obs)
+        return {'obs': obs,
+                'action': self.action[idx],
+                'reward': self.reward[idx],
+                'next_obs': next_obs,
+                'done': self.done[idx]}
@@ -0,0 +1,196 @@
+import struct
+from copy import deepcopy
+
+from discreteEngine2_5 import *
+
+# Append-only episode log for discreteGame. Instead of frames, each record holds the starting level
+# (walls, gold, pose), its id / seed and one byte per action. The dynamics are deterministic, so that
+# is enough to rebuild every state, and frames can be re-rendered afterwards at any gameSize or zoom.
+#
+# Record layout (little-endian):
+#   magic 'DGE3' | level_id: H length + utf-8 | seed: q (-1 if unknown) | gameSize: I
+#   indicator_length, agent_r, gold_r, agent_x, agent_y, direction: 6 doubles
+#   physics: B index into PHYSICS | discrete_headings: B | sdf_resolution: I
+#   gold: H count + 2 doubles each | walls: H count + 5 doubles each
+#   actions: I count + one unsigned byte each
+# Older 'DGE2' records stop after discrete_headings, and 'DGEP' ones have no physics bytes at all (physics='python').
+# These all change collision results: physics='fixed' rounds every step differently and the sdf answers from a grid,
+# so an episode only replays under the same settings.
+
+MAGIC = b'DGE3'
+MAGIC_V2 = b'DGE2'
+MAGIC_V1 = b'DGEP'
+PHYSICS = ['python', 'numba', 'auto', 'fixed']
+
+# A transition cache replays the result of any state within cache_quantum, which a replay can't reproduce (its cache
+# starts empty), so only games with quanta up to discreteGame's default can be recorded.
+MAX_CACHE_QUANTUM = 1e-9
+
+_scalars = struct.Struct('<qI6d')
+_physics = struct.Struct('<BBI')
+_physics_v2 = struct.Struct('<BB')
+_count = struct.Struct('<H')
+_numActions = struct.Struct('<I')
+
+
+def encode_episode(settings, actions, level_id='', seed=None, physics='python', discrete_headings=False, sdf_resolution=0):
+    name = level_id.encode('utf-8')
+    parts = [MAGIC, _count.pack(len(name)), name]
+    parts.append(_scalars.pack(-1 if seed is None else seed,
+                               settings.gameSize,
+                               settings.indicator_length,
+                               settings.agent_r,
+                               settings.gold_r,
+                               settings.agent_x,
+                               settings.agent_y,
+                               settings.direction))
+    parts.append(_physics.pack(PHYSICS.index(physics), discrete_headings, sdf_resolution))
+    parts.append(_count.pack(len(settings.gold)))
+    for coords in settings.gold:
+        parts.append(struct.pack('<2d', *coords))
+    parts.append(_count.pack(len(settings.walls)))
+    for params in settings.walls:
+        parts.append(struct.pack('<5d', *params))
+    parts.append(_numActions.pack(len(actions)))
+    parts.append(bytes(actions))
+    return b''.join(parts)
+
+
+def decode_episode(buf, offset=0):
+    """Returns (Episode, offset just past the record)."""
+    magic = bytes(buf[offset:offset + 4])
+    assert magic in (MAGIC, MAGIC_V2, MAGIC_V1), "not an episode record at offset " + str(offset)
+    offset += 4
+    (name_len,) = _count.unpack_from(buf, offset)
+    offset += _count.size
+    level_id = bytes(buf[offset:offset + name_len]).decode('utf-8')
+    offset += name_len
+    seed, gameSize, indicator_length, agent_r, gold_r, agent_x, agent_y, direction = _scalars.unpack_from(buf, offset)
+    offset += _scalars.size
+    physics_index, discrete_headings, sdf_resolution = 0, False, 0
+    if magic == MAGIC:
+        physics_index, discrete_headings, sdf_resolution = _physics.unpack_from(buf, offset)
+        offset += _physics.size
+    elif magic == MAGIC_V2:
+        physics_index, discrete_headings = _physics_v2.unpack_from(buf, offset)
+        offset += _physics_v2.size
+    physics, discrete_headings = PHYSICS[physics_index], bool(discrete_headings)
+    (num_gold,) = _count.unpack_from(buf, offset)
+    offset += _count.size
+    gold = []
+    for i in range(num_gold):
+        gold.append(list(struct.unpack_from('<2d', buf, offset)))
+        offset += 16
+    (num_walls,) = _count.unpack_from(buf, offset)
+    offset += _count.size
+    walls = []
+    for i in range(num_walls):
+        walls.append(list(struct.unpack_from('<5d', buf, offset)))
+        offset += 40
+    (num_actions,) = _numActions.unpack_from(buf, offset)
+    offset += _numActions.size
+    actions = bytes(buf[offset:offset + num_actions])
+    offset += num_actions
+    settings = Settings(gameSize,
+                        direction=direction,
+                        agent_x=agent_x,
+                        agent_y=agent_y,
+                        agent_r=agent_r,
+                        gold_r=gold_r,
+                        gold=gold,
+                        walls=walls,
+                        indicator_length=indicator_length)
+    return Episode(settings, actions, level_id, None if seed < 0 else seed, physics, discrete_headings, sdf_resolution), offset
+
+
+class EpisodeRecorder:
+    """Attach to a discreteGame; every reset() starts a record and every step() appends an action.
+    A record is written out when the next episode starts, or on flush() / close()."""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'ab')
+        self._header = None
+        self._actions = bytearray()
+        self._physics = ('python', False, 0)
+
+    def attach(self, game):
+        assert game.transitions is None or game.cache_quantum <= MAX_CACHE_QUANTUM, \
+            "can't record a game whose transition cache merges nearby states (cache_quantum > MAX_CACHE_QUANTUM)"
+        game.trajectory_log = self
+        self._physics = (game.physics, game.discrete_headings, game.sdf_resolution) # replays need the same dynamics
+        self.begin_episode(game.settings, game.level_id, game.seed) # mid-episode attach records from the current state
+
+    def begin_episode(self, settings, level_id='', seed=None):
+        self.flush()
+        self._header = (deepcopy(settings), level_id, seed)
+        self._actions = bytearray()
+
+    def record(self, actionIndex):
+        self._actions.append(actionIndex)
+
+    def flush(self):
+        if self._header is not None:
+            settings, level_id, seed = self._header
+            self._file.write(encode_episode(settings, self._actions, level_id, seed, *self._physics))
+            self._file.flush()
+            self._header = None
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class Episode:
+    def __init__(self, settings, actions, level_id='', seed=None, physics='python', discrete_headings=False, sdf_resolution=0):
+        self.settings = settings
+        self.actions = actions
+        self.level_id = level_id
+        self.seed = seed
+        self.physics = physics
+        self.discrete_headings = discrete_headings
+        self.sdf_resolution = sdf_resolution
+
+    def _game(self, gameSize=None):
+        settings = deepcopy(self.settings)
+        if gameSize is not None:
+            settings.gameSize = gameSize
+        return discreteGame(settings, envMode=True, level_id=self.level_id, physics=self.physics,
+                            discrete_headings=self.discrete_headings, sdf_resolution=self.sdf_resolution)
+
+    def states(self):
+        """Compact states (see discreteGame.compact_state) before the first action and after each one.
+        Physics always runs at the recorded gameSize, since biggest_step quantizes to it."""
+        game = self._game()
+        yield game.compact_state()
+        for actionIndex in self.actions:
+            game.actions[actionIndex]()
+            yield game.compact_state()
+
+    def rewards(self):
+        game = self._game()
+        return [game.actions[actionIndex]() for actionIndex in self.actions]
+
+    def frames(self, gameSize=None, factor=None, center=None):
+        """Re-rendered observations, one per state. With a zoom factor, frames are gameSize crops around
+        center (default: the agent), as in discreteGame.zoom."""
+        renderer = self._game(gameSize)
+        for state in self.states():
+            renderer.load_compact_state(state)
+            if factor is None:
+                yield renderer.getData()
+            else:
+                zoom_center = center if center is not None else (state[0], state[1])
+                yield renderer.zoom([zoom_center], factor)[0]
+
+
+class EpisodeReplayer:
+    def __init__(self, path):
+        self.path = path
+
+    def episodes(self):
+        with open(self.path, 'rb') as f:
+            buf = f.read()
+        offset = 0
+        while offset < len(buf):
+            episode, offset = decode_episode(buf, offset)
+            yield episode
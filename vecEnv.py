@@ -0,0 +1,110 @@
+import time
+from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from discreteEngine2_5 import *
+
+# Several discreteGames stepped together, with observations written straight into one preallocated batch array.
+
+
+class DiscreteVecEnv:
+    def __init__(self, settings_list, frame_stack=0, level_pool=None, render_threads=0, **game_kwargs):
+        """settings_list: one Settings per env (all with the same gameSize). Other keyword args go to every discreteGame.
+        level_pool: a levelPool.LevelPool shared by all envs for reset(randomize=True).
+        render_threads = T: physics stays on the calling thread, but the envs' frames are drawn and copied out on a pool
+        of T threads. Every env draws onto its own surface, and pygame's fill/blit/draw release the GIL."""
+        self.envs = [discreteGame(deepcopy(settings), envMode=True, **game_kwargs) for settings in settings_list]
+        if level_pool is not None:
+            for env in self.envs:
+                level_pool.attach(env)
+        self.num_envs = len(self.envs)
+        self.frame_stack = frame_stack
+        frame_shape = self.envs[0].observation_shape()
+        if frame_stack:
+            self._ring = FrameRing(frame_stack, frame_shape, batch=self.num_envs)
+        else:
+            self._ring = None
+            self._obs = np.zeros((self.num_envs,) + frame_shape, dtype=np.uint8)
+        self.rewards = np.zeros(self.num_envs, dtype=np.float32)
+        self.terminated = np.zeros(self.num_envs, dtype=bool)
+        self.truncated = np.zeros(self.num_envs, dtype=bool)
+        self.render_threads = render_threads
+        self._pool = ThreadPoolExecutor(render_threads) if render_threads else None
+
+    def _write_frames(self, out, indices, serial=False):
+        if self._pool is None or serial:
+            for i in indices:
+                self.envs[i].write_frame(out[i])
+        else:
+            # one contiguous chunk of envs per thread; a task per env costs more than drawing a small frame
+            indices = list(indices)
+            size = -(-len(indices) // self.render_threads)
+            chunks = [indices[k:k + size] for k in range(0, len(indices), size)]
+            for done in self._pool.map(lambda chunk : self._write_frames(out, chunk, serial=True), chunks):
+                pass # re-raises anything a render thread raised
+
+    def _slot(self, advance):
+        if self._ring is None:
+            return self._obs
+        if advance:
+            return self._ring.next_slot()
+        return self._ring.newest()
+
+    def _batch(self):
+        """The returned observation batch; a view, reused by later calls."""
+        if self._ring is None:
+            return self._obs
+        return self._ring.view()
+
+    def reset(self, indices=None, randomize=False):
+        """Resets all envs (indices=None) or just some; with randomize, onto fresh random_settings levels.
+        A partial reset only re-renders those envs, in place of their newest frame."""
+        full = indices is None
+        if full:
+            indices = range(self.num_envs)
+        out = self._slot(advance=full)
+        for i in indices:
+            if randomize:
+                self.envs[i].random_reset()
+            else:
+                self.envs[i].reset()
+        self._write_frames(out, indices)
+        if self._ring is not None:
+            for i in indices:
+                self._ring.fill_history(i)
+        return self._batch(), [{} for i in range(self.num_envs)]
+
+    def step(self, actions):
+        for i, env in enumerate(self.envs):
+            self.rewards[i] = env.act(actions[i])
+        self._write_frames(self._slot(advance=True), range(self.num_envs))
+        return self._batch(), self.rewards, self.terminated, self.truncated, [{} for i in range(self.num_envs)]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+def benchmark_render_threads(threads=(1, 2, 4, 8), gameSize=64, num_envs=16, num_steps=200):
+    """Vec env steps per second with 0 (serial) and each count of render threads."""
+    import random
+    from levels.skeleton2_5 import settings_from_level
+    settings_list = [settings_from_level('tool_use_advanced', gameSize) for i in range(num_envs)]
+    rates = {}
+    for count in (0,) + tuple(threads):
+        vec = DiscreteVecEnv(settings_list, render_threads=count)
+        vec.reset()
+        start = time.perf_counter()
+        for t in range(num_steps):
+            vec.step([random.randint(0, 4) for i in range(num_envs)])
+        rates[count] = num_envs*num_steps / (time.perf_counter() - start)
+        vec.close()
+    return rates
+
+
+if __name__ == "__main__":
+    for gameSize in (64, 256):
+        rates = benchmark_render_threads(gameSize=gameSize)
+        print("gameSize " + str(gameSize) + ": " + ", ".join(str(count) + " threads " + str(round(rate)) + " steps/s"
+                                                         for count, rate in rates.items()))
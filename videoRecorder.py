@@ -0,0 +1,126 @@
+import os
+import queue
+import threading
+import numpy as np
+
+# Records the frames a discreteGame hands out from step() / reset() without making stepping wait on the disk.
+# capture() copies the frame into a bounded queue; a background thread groups the frames by episode and streams each
+# episode out as compressed .npz (zip / deflate) parts of up to chunk_frames frames, episode_EEEEEE_PPPP.npz in
+# `directory`, so the writer never holds more than one part in memory. load_episode() joins the parts back up:
+#   frames  (n, ...) uint8, the observations in order
+#   steps   (n,) the step index of each frame within the episode (gaps where frames were dropped)
+#   rewards (n,) the reward returned with each frame (0 for the reset frame)
+#
+# When the writer falls behind and the queue is full, `drop` decides: 'newest' discards the incoming frame,
+# 'oldest' discards the oldest queued one to make room, and 'block' waits (the only policy that can stall stepping).
+# A failed write (disk full, directory gone) doesn't stop the writer; the error is raised from the next capture() or
+# close() instead.
+
+
+class VideoRecorder:
+    def __init__(self, directory, maxsize=256, drop='newest', every=1, chunk_frames=None):
+        """every = k: only record episodes 0, k, 2k, ... (counting resets since attach).
+        chunk_frames: frames per file (default maxsize), which bounds the writer's memory along with the queue."""
+        assert drop in ('newest', 'oldest', 'block'), "drop must be 'newest', 'oldest' or 'block'"
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.drop = drop
+        self.every = every
+        self.chunk_frames = chunk_frames or maxsize
+        self.episode = 0
+        self.step_count = 0
+        self.dropped = 0
+        self.written = 0 # episodes
+        self.error = None # the last write failure, until capture() or close() raises it
+        self._queue = queue.Queue(maxsize)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def attach(self, game):
+        game.video_recorder = self # mid-episode attach records from the next frame on
+
+    def begin_episode(self):
+        if self.step_count: # a reset right after attach starts episode 0, not 1
+            self.episode += 1
+        self.step_count = 0
+
+    def recording(self):
+        return self.episode % self.every == 0
+
+    def _raise_error(self):
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def capture(self, game, reward=0):
+        self._raise_error()
+        step = self.step_count
+        self.step_count += 1
+        if not self.recording():
+            return
+        frame = np.empty(game.observation_shape(), dtype=np.uint8)
+        game.write_frame(frame)
+        self._put((self.episode, step, reward, frame))
+
+    def _put(self, item):
+        if self.drop == 'block':
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            if self.drop == 'oldest':
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    self._queue.put_nowait(item)
+                except queue.Full: # the caller is the only producer, but don't wait even so
+                    pass
+
+    def _write_part(self, episode, part, items):
+        try:
+            np.savez_compressed(os.path.join(self.directory, 'episode_%06d_%04d.npz' % (episode, part)),
+                                frames=np.stack([item[3] for item in items]),
+                                steps=np.array([item[1] for item in items], dtype=np.uint32),
+                                rewards=np.array([item[2] for item in items], dtype=np.float32))
+            return True
+        except Exception as e: # keep draining the queue, or 'block' would stall the game for good
+            self.error = e
+            return False
+
+    def _write_loop(self):
+        current, part, items, saved = None, 0, [], False
+        while True:
+            item = self._queue.get()
+            if item is None or item[0] != current:
+                if items:
+                    saved |= self._write_part(current, part, items)
+                if saved:
+                    self.written += 1
+                current, part, items, saved = (None if item is None else item[0]), 0, [], False
+            if item is None:
+                self._queue.task_done()
+                return
+            items.append(item)
+            if len(items) >= self.chunk_frames:
+                saved |= self._write_part(current, part, items)
+                part, items = part + 1, []
+            self._queue.task_done()
+
+    def close(self):
+        """Waits for the queued frames to be written, including the episode in progress."""
+        self._queue.put(None)
+        self._writer.join()
+        self._raise_error()
+
+
+def load_episode(directory, episode):
+    """One recorded episode as a dict of frames, steps and rewards, its parts joined in order."""
+    parts = []
+    while os.path.exists(os.path.join(directory, 'episode_%06d_%04d.npz' % (episode, len(parts)))):
+        parts.append(np.load(os.path.join(directory, 'episode_%06d_%04d.npz' % (episode, len(parts)))))
+    assert parts, "no recording of episode " + str(episode) + " in " + directory
+    return {key : np.concatenate([part[key] for part in parts]) for key in ('frames', 'steps', 'rewards')}
@@ -0,0 +1,128 @@
+import math
+
+# Level-compile step for the collision walls. full_wall_check only asks whether the agent's circle touches ANY wall,
+# i.e. the union of the walls, so walls can be merged or dropped as long as the union stays the same:
+#   - a wall inside another wall (or a duplicate of one) is dropped;
+#   - two axis-aligned (theta == 0) walls with the same top and bottom whose x ranges touch or overlap become one
+#     wall, and likewise for the same left and right with touching y ranges. Only done when the merged wall's
+#     left + w lands on exactly the same float as the original edge, so the comparisons in wall_overlap_check
+#     see the same numbers.
+# Unrotated walls go through wall_overlap_check without rounding (backRot by 0 is the identity), and every test
+# against the merged wall reduces to a test against one of its parts, so collision results do not change;
+# check_exact() compares against the raw walls on every level. Only collision uses this; drawing keeps settings.walls.
+#
+# wall_bounds gives each wall's axis-aligned bounding box, for rejecting far-away walls before the full test.
+
+BOUNDS_SLACK = 1e-9 # world units; far more than the rounding in rotating a wall's corners
+
+
+def _edges(params):
+    wall_x, wall_y, wall_w, wall_h = params[:4]
+    return wall_x, wall_y, wall_x + wall_w, wall_y + wall_h
+
+def _contains(outer, inner):
+    if list(outer) == list(inner):
+        return True
+    if outer[4] != 0 or inner[4] != 0:
+        return False
+    left, top, right, bot = _edges(outer)
+    in_left, in_top, in_right, in_bot = _edges(inner)
+    return left <= in_left and in_right <= right and top <= in_top and in_bot <= bot
+
+def _merged(a, b):
+    """a and b as one wall, or None if their union isn't a rectangle (or isn't one exactly, in floats)."""
+    if a[4] != 0 or b[4] != 0:
+        return None
+    a_left, a_top, a_right, a_bot = _edges(a)
+    b_left, b_top, b_right, b_bot = _edges(b)
+    if a_top == b_top and a_bot == b_bot and a_left <= b_right and b_left <= a_right:
+        left, right = min(a_left, b_left), max(a_right, b_right)
+        wall = [left, a_top, right - left, a[3], 0]
+    elif a_left == b_left and a_right == b_right and a_top <= b_bot and b_top <= a_bot:
+        top, bot = min(a_top, b_top), max(a_bot, b_bot)
+        wall = [a_left, top, a[2], bot - top, 0]
+    else:
+        return None
+    if _edges(wall) != (min(a_left, b_left), min(a_top, b_top), max(a_right, b_right), max(a_bot, b_bot)):
+        return None
+    return wall
+
+def simplify_walls(walls):
+    """A shorter list of walls with the same union, for collision checks."""
+    res = [list(params) for params in walls]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(res)):
+            for j in range(len(res)):
+                if i == j:
+                    continue
+                if _contains(res[i], res[j]):
+                    del res[j]
+                    changed = True
+                    break
+                wall = _merged(res[i], res[j])
+                if wall is not None:
+                    res[i] = wall
+                    del res[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return res
+
+def wall_bounds(walls):
+    """(min_x, min_y, max_x, max_y) per wall, with the corners rotated the way wall_overlap_check's backRot undoes."""
+    bounds = []
+    for wall_x, wall_y, wall_w, wall_h, wall_theta in walls:
+        c = math.cos(wall_theta)
+        s = math.sin(wall_theta)
+        left = c*wall_x + s*wall_y
+        top = c*wall_y - s*wall_x
+        xs, ys = [], []
+        for u, v in ((left, top), (left + wall_w, top), (left, top + wall_h), (left + wall_w, top + wall_h)):
+            xs.append(c*u - s*v)
+            ys.append(s*u + c*v)
+        bounds.append((min(xs), min(ys), max(xs), max(ys)))
+    return bounds
+
+def compile_walls(walls):
+    """[(params, bounds)] for discreteGame's python collision path."""
+    walls = simplify_walls(walls)
+    return list(zip(walls, wall_bounds(walls)))
+
+
+def check_exact(num_probes=20000, num_random=200, seed=0):
+    """The compiled walls must give the same full_wall_check answers as the raw ones, on every level in levels/ and on
+    random levels. Probes are uniform, plus points exactly agent_r away from wall edges and corners."""
+    import random
+    from discreteEngine2_5 import discreteGame
+    from levels.skeleton2_5 import all_level_settings
+
+    rng = random.Random(seed)
+    raw = discreteGame(envMode=True, compile_walls=False)
+    compiled = discreteGame(envMode=True)
+    levels = list(all_level_settings().items())
+    random.seed(seed)
+    levels += [('random %d' % k, raw.random_settings()) for k in range(num_random)]
+    removed = 0
+    for name, settings in levels:
+        walls = settings.walls
+        r = settings.agent_r
+        probes = [(rng.uniform(-0.1, 1.1), rng.uniform(-0.1, 1.1)) for i in range(num_probes)]
+        for wall_x, wall_y, wall_w, wall_h, wall_theta in walls:
+            for x in (wall_x - r, wall_x, wall_x + wall_w, wall_x + wall_w + r):
+                for y in (wall_y - r, wall_y, wall_y + wall_h, wall_y + wall_h + r):
+                    probes.append((x, y))
+        for x, y in probes:
+            assert compiled.full_wall_check(x, y, walls, r) == raw.full_wall_check(x, y, walls, r), \
+                "%s: compiled walls differ at (%r, %r)" % (name, x, y)
+        removed += len(walls) - len(simplify_walls(walls))
+    return removed
+
+
+if __name__ == "__main__":
+    from levels.skeleton2_5 import all_level_settings
+    for name, settings in all_level_settings().items():
+        print("%-20s %2d walls -> %2d" % (name, len(settings.walls), len(simplify_walls(settings.walls))))
+    print("compiled walls match the raw ones; %d walls removed in total" % check_exact())
@@ -0,0 +1,71 @@
+import math
+from collections import OrderedDict
+import numpy as np
+
+# Signed distance to the union of a level's walls, sampled on a grid over the unit square.
+# wall_overlap_check is exactly "distance from the centre to the wall < radius", so with the field a circle of any
+# radius is checked by one bilinear lookup, whatever the number of walls. The field is 1-Lipschitz, so lookups are
+# within about one cell (1/resolution) of the analytic distance; raise the resolution for tighter contact.
+
+
+def wall_distance(xs, ys, walls):
+    """Signed distance from each point to the nearest wall (negative inside one). Vectorized over points."""
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    best = np.full(np.broadcast(xs, ys).shape, np.inf)
+    for wall_x, wall_y, wall_w, wall_h, wall_theta in walls:
+        c = math.cos(wall_theta)
+        s = math.sin(wall_theta)
+        px = c*xs + s*ys # same back-rotation as discreteGame.backRot
+        py = 0 - s*xs + c*ys
+        left = c*wall_x + s*wall_y
+        top = 0 - s*wall_x + c*wall_y
+        qx = np.maximum(left - px, px - (left + wall_w))
+        qy = np.maximum(top - py, py - (top + wall_h))
+        outside = np.hypot(np.maximum(qx, 0), np.maximum(qy, 0))
+        inside = np.minimum(np.maximum(qx, qy), 0)
+        np.minimum(best, outside + inside, out=best)
+    return best
+
+
+class WallField:
+    def __init__(self, walls, resolution=256):
+        self.resolution = resolution
+        self.walls = [list(params) for params in walls]
+        coords = np.linspace(0, 1, resolution + 1)
+        xs, ys = np.meshgrid(coords, coords, indexing='ij') # [x, y], like surfarray
+        self.field = wall_distance(xs, ys, self.walls)
+
+    def distance(self, x, y):
+        if not (0 <= x <= 1 and 0 <= y <= 1): # off the grid (e.g. top_half's agent): fall back to the exact value
+            return float(wall_distance(x, y, self.walls))
+        fx = x*self.resolution
+        fy = y*self.resolution
+        i = min(int(fx), self.resolution - 1)
+        j = min(int(fy), self.resolution - 1)
+        tx = fx - i
+        ty = fy - j
+        f = self.field
+        return ((1 - tx)*((1 - ty)*f[i, j] + ty*f[i, j + 1]) +
+                tx*((1 - ty)*f[i + 1, j] + ty*f[i + 1, j + 1]))
+
+    def clear(self, x, y, radius):
+        """Same question as discreteGame.full_wall_check: does a circle of this radius at (x, y) miss every wall?"""
+        return self.distance(x, y) >= radius
+
+
+_fields = OrderedDict()
+MAX_CACHED_FIELDS = 64
+
+def field_for(walls, resolution=256):
+    """Shared, bounded cache: levels with equal walls (e.g. after reset's deepcopy) reuse one field."""
+    key = (tuple(tuple(params) for params in walls), resolution)
+    field = _fields.get(key)
+    if field is None:
+        field = WallField(walls, resolution)
+        _fields[key] = field
+        if len(_fields) > MAX_CACHED_FIELDS:
+            _fields.popitem(last=False)
+    else:
+        _fields.move_to_end(key)
+    return field